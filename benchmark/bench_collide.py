@@ -0,0 +1,43 @@
+'''Measure the cost of finding the entity of a shape in the collision handlers,
+   for the old linear scan of the entity list and the shape_to_entity index.
+   run: python -m benchmark.bench_collide'''
+__author__ = 'marble_xu'
+
+import timeit
+from source import tool
+from source.component import physics, block
+from . import levelgen
+
+BLOCK_NUMS = (10, 30, 100, 300, 1000, 3000)
+
+def setup_physics(block_num):
+    phy = physics.Physics()
+    for data in levelgen.make_level(block_num)['blocks']:
+        phy.add_block(block.create_block(data['x'], data['y'], data['material'],
+                                         data['shape'], data['type']))
+    return phy
+
+def find_by_scan(phy, shape):
+    for item in phy.blocks:
+        if shape == item.phy.shape:
+            return item
+
+def find_by_index(phy, shape):
+    return phy.shape_to_entity.get(shape)
+
+def main():
+    tool.init(headless=True)
+    print('%8s %14s %14s %8s' % ('blocks', 'scan(us)', 'index(us)', 'speedup'))
+    for block_num in BLOCK_NUMS:
+        phy = setup_physics(block_num)
+        # average over all the shapes, the scan cost depends on the list position
+        shapes = [item.phy.shape for item in phy.blocks]
+        number = max(1, 20000 // block_num)
+        scan = timeit.timeit(lambda: [find_by_scan(phy, s) for s in shapes], number=number)
+        index = timeit.timeit(lambda: [find_by_index(phy, s) for s in shapes], number=number)
+        calls = number * len(shapes)
+        scan_us, index_us = scan / calls * 1e6, index / calls * 1e6
+        print('%8d %14.3f %14.3f %7.1fx' % (block_num, scan_us, index_us, scan_us / index_us))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+'''Compare the explosions shooting 12 explosion pieces with the explosions applied
+   by one space query on an explosion heavy scenario: a generated level is hit by
+   an explosion every few frames, like a black bird followed by a white bird dropping
+   eggs. Measured are the time of the frames and of create_explosion(), the physics
+   steps, the most bodies in the space, and the blocks destroyed and the damage,
+   which should stay close between the two.
+   The outcomes of the two are compared on the shipped levels too: a grid of shots of
+   a black bird at each level, summing the pigs killed, the blocks destroyed and the
+   score, the query is calibrated by EXPLOSION_PUSH and EXPLOSION_DAMAGE until they match.
+   run: python -m benchmark.bench_explosion [--push PUSH] [--damage DAMAGE]'''
+__author__ = 'marble_xu'
+
+import time
+import random
+import argparse
+from source import tool, headless
+from source import constants as c
+from source.component import physics, block, bird
+from . import levelgen
+
+BLOCK_NUMS = (90, 270, 540)
+SETTLE_FRAMES = 200
+EXPLOSION_NUM = 40
+EXPLOSION_FRAMES = 10 # frames between two explosions
+REST_FRAMES = 120
+# radius, length and mass of the explosion of the black bird
+EXPLOSION = (15, 60, 5)
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+# (sling distance, angle) of the shots at the shipped levels
+SHOTS = [(distance, angle / 100) for distance in (60, 70, 80, 90) for angle in range(-60, 10, 7)]
+MAX_REST_TIME = 5000 # millisecond
+
+def setup_physics(block_num, query_explosion):
+    phy = physics.Physics(query_explosion=query_explosion)
+    level_data = levelgen.make_level(block_num)
+    for data in level_data['blocks']:
+        phy.add_block(block.create_block(data['x'], data['y'], data['material'],
+                                         data['shape'], data['type']))
+    return phy, level_data['blocks']
+
+def run(block_num, query_explosion):
+    phy, blocks_data = setup_physics(block_num, query_explosion)
+    game_info = {c.CURRENT_TIME:0}
+    def update():
+        game_info[c.CURRENT_TIME] = phy.clock.get_ticks()
+        phy.update(game_info, None, False)
+
+    for i in range(SETTLE_FRAMES):
+        update()
+    phy.enable_check_collide()
+    life = sum(item.life for item in phy.blocks)
+    block_num = len(phy.blocks)
+    top = min(data['y'] for data in blocks_data)
+    rand = random.Random(0)
+
+    step_num = phy.clock.step_num
+    frame_time = explosion_time = 0
+    max_bodies = 0
+    for i in range(EXPLOSION_NUM):
+        x = rand.uniform(440, 440 + 17 * 40)
+        y = rand.uniform(top, c.GROUND_HEIGHT)
+        start = time.perf_counter()
+        phy.create_explosion(physics.to_pymunk(x, y), *EXPLOSION)
+        explosion_time += time.perf_counter() - start
+        for j in range(EXPLOSION_FRAMES):
+            start = time.perf_counter()
+            update()
+            frame_time += time.perf_counter() - start
+            max_bodies = max(max_bodies, len(phy.space.bodies))
+    for i in range(REST_FRAMES):
+        update()
+    step_num = phy.clock.step_num - step_num
+
+    damage = life - sum(max(item.life, 0) for item in phy.blocks)
+    return (frame_time / (EXPLOSION_NUM * EXPLOSION_FRAMES) * 1000,
+            explosion_time / EXPLOSION_NUM * 1000, step_num, max_bodies,
+            block_num - len(phy.blocks), damage)
+
+def shoot_black_bird(level_num, distance, angle, query_explosion):
+    '''return (pigs killed, blocks destroyed, score) of a black bird shot at the level'''
+    sim = headless.Simulation(level_num)
+    level = sim.level
+    phy = level.physics
+    phy.query_explosion = query_explosion
+    level.birds[0] = bird.create_bird(c.BLACK_BIRD, 0, 0)
+    level.select_bird()
+    pig_num, block_num = len(phy.pigs), len(phy.blocks)
+    sim.shoot(distance, angle)
+    start_time = sim.current_time
+    while not phy.is_at_rest() and sim.current_time - start_time < MAX_REST_TIME:
+        sim.step()
+    return pig_num - len(phy.pigs), block_num - len(phy.blocks), level.score
+
+def run_level(level_num, query_explosion):
+    results = [shoot_black_bird(level_num, distance, angle, query_explosion)
+               for distance, angle in SHOTS]
+    return tuple(sum(result[i] for result in results) for i in range(3))
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the explosion pieces with the query explosion')
+    parser.add_argument('--push', type=float, default=c.EXPLOSION_PUSH)
+    parser.add_argument('--damage', type=float, default=c.EXPLOSION_DAMAGE)
+    args = parser.parse_args()
+    c.EXPLOSION_PUSH = args.push
+    c.EXPLOSION_DAMAGE = args.damage
+    tool.init(headless=True)
+    print('%7s %-7s %10s %15s %8s %11s %10s %8s' % ('blocks', 'mode', 'frame(ms)',
+          'explosion(ms)', 'steps', 'max bodies', 'destroyed', 'damage'))
+    for block_num in BLOCK_NUMS:
+        for query_explosion, mode in ((False, 'pieces'), (True, 'query')):
+            result = run(block_num, query_explosion)
+            print('%7d %-7s %10.3f %15.4f %8d %11d %10d %8d' % ((block_num, mode) + result))
+
+    print('%d black bird shots per level, push %g, damage %g' % (len(SHOTS),
+          args.push, args.damage))
+    print('%6s %-7s %12s %10s %8s' % ('level', 'mode', 'pigs killed', 'destroyed', 'score'))
+    for level_num in LEVEL_NUMS:
+        for query_explosion, mode in ((False, 'pieces'), (True, 'query')):
+            result = run_level(level_num, query_explosion)
+            print('%6d %-7s %12d %10d %8d' % ((level_num, mode) + result))
+
+if __name__ == '__main__':
+    main()
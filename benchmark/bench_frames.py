@@ -0,0 +1,81 @@
+'''Compare the sprite frames made by every call of tool.make_image with the frames
+   of the shared frame cache of tool.get_image, which are made once in the display
+   pixel format with run length encoding. The level load time is measured with
+   the images shared by the entity classes cleared, so every frame is requested again.
+   run: python -m benchmark.bench_frames'''
+__author__ = 'marble_xu'
+
+import os
+import time
+import pygame as pg
+from source import tool
+from source import constants as c
+from source.state import level
+from source.component import bird, pig, block
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+BLIT_ROUNDS = 200
+
+def clear_shared_images():
+    bird.Bird.SHARED_IMAGES.clear()
+    pig.Pig.SHARED_IMAGES.clear()
+    block.Block.SHARED_IMAGES.clear()
+
+def load_levels(get_image):
+    '''return the load time and the time in get_image in milliseconds of every level,
+       and the frames of the levels'''
+    frame_time = [0]
+    def timed_get_image(*args):
+        start = time.perf_counter()
+        image = get_image(*args)
+        frame_time[0] += time.perf_counter() - start
+        return image
+
+    tool.get_image = timed_get_image
+    frames = []
+    times = []
+    for level_num in LEVEL_NUMS:
+        clear_shared_images()
+        game_info = {c.CURRENT_TIME:0, c.LEVEL_NUM:level_num, c.SCORE:0}
+        state = level.Level()
+        frame_time[0] = 0
+        start = time.perf_counter()
+        state.startup(0, game_info)
+        times.append(((time.perf_counter() - start) * 1000, frame_time[0] * 1000))
+        for item in state.birds + state.physics.pigs:
+            frames.extend(item.frames)
+        for item in state.physics.blocks:
+            frames.extend(item.images)
+    return times, frames
+
+def blit_frames(frames):
+    '''return the number of frame blits per second'''
+    screen = pg.display.get_surface()
+    start = time.perf_counter()
+    for i in range(BLIT_ROUNDS):
+        for frame in frames:
+            screen.blit(frame, (100, 100))
+    return BLIT_ROUNDS * len(frames) / (time.perf_counter() - start)
+
+def main():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tool.init()
+    get_image = tool.get_image
+    results = {}
+    for name, function in (('make', tool.make_image), ('cache', get_image)):
+        times, frames = load_levels(function)
+        # the first level of the cache includes making the frames
+        results[name] = (times, blit_frames(frames))
+    tool.get_image = get_image
+    clear_shared_images()
+
+    print('%6s %12s %12s %14s %14s' % ('level', 'load make', 'load cache',
+          'get_image make', 'get_image cache'))
+    for i, level_num in enumerate(LEVEL_NUMS):
+        print('%6d %10.3fms %10.3fms %12.3fms %12.3fms' % (level_num, results['make'][0][i][0],
+              results['cache'][0][i][0], results['make'][0][i][1], results['cache'][0][i][1]))
+    print('blits per second: make %.0f, cache %.0f, %.2fx' % (results['make'][1],
+          results['cache'][1], results['cache'][1] / results['make'][1]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''Build many levels, let their bodies fall asleep and drop them with gc.collect()
+   between them. A space freed by the garbage collector after its sleeping bodies
+   crashes the process, so the physics must tear its space down when it is reset or
+   freed, and must be freed without the garbage collector. Measured are the time of
+   building, settling and dropping a level, the sleeping bodies of the dropped levels,
+   and the physics, bodies and shapes found by the garbage collector, which should be 0.
+   The exit status is 1 if any is found.
+   run: python -m benchmark.bench_gc'''
+__author__ = 'marble_xu'
+
+import gc
+import sys
+import time
+import pymunk as pm
+from source import tool, headless
+from source.component import physics
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+ROUNDS = 5
+SETTLE_FRAMES = 300
+SHOT = (85, -0.3)
+
+def count_collected():
+    '''return the number of physics, and bodies and shapes in a space, among the
+       garbage collected. The spaces are always collected, pymunk keeps them in a
+       reference cycle, they must be empty'''
+    gc.set_debug(gc.DEBUG_SAVEALL)
+    gc.collect()
+    gc.set_debug(0)
+    num = 0
+    for item in gc.garbage:
+        # type() instead of isinstance(), there are dead weak proxies in the garbage
+        if type(item) is physics.Physics:
+            num += 1
+        elif type(item) is pm.Space:
+            num += len(item.bodies) + len(item.shapes)
+    gc.garbage.clear()
+    return num
+
+def run_level(level_num):
+    '''return (sleeping bodies, milliseconds) of a level settled, shot, reset, settled
+       and dropped'''
+    start = time.perf_counter()
+    sim = headless.Simulation(level_num)
+    for i in range(SETTLE_FRAMES):
+        sim.step()
+    sim.shoot(*SHOT)
+    for i in range(SETTLE_FRAMES):
+        sim.step()
+    # the level is reset once, which replaces the space
+    sim.level.reset()
+    for i in range(SETTLE_FRAMES):
+        sim.step()
+    sleeping = sum(1 for body in sim.level.physics.space.bodies if body.is_sleeping)
+    del sim
+    return sleeping, (time.perf_counter() - start) * 1000
+
+def main():
+    tool.init(headless=True)
+    gc.collect()
+    print('%6s %10s %10s %10s' % ('level', 'sleeping', 'time(ms)', 'collected'))
+    total = 0
+    for i in range(ROUNDS):
+        for level_num in LEVEL_NUMS:
+            sleeping, elapsed = run_level(level_num)
+            collected = count_collected()
+            total += collected
+            if i == 0:
+                print('%6d %10d %10.1f %10d' % (level_num, sleeping, elapsed, collected))
+    print('%d levels dropped, %d physics, bodies and shapes collected by the garbage collector'
+          % (ROUNDS * len(LEVEL_NUMS), total))
+    if total:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''Run a level with the fixed rate physics of tool.Control.main_fixed_rate at several
+   render frame rates, the real time is simulated, so a second of the game has
+   exactly PHYSICS_RATE updates. Every frame is drawn with Level.render between the
+   last two updates. The outcome (score and the positions of the bodies) must be
+   the same as without rendering, and the time of a rendered frame is measured.
+   run: python -m benchmark.bench_interpolate'''
+__author__ = 'marble_xu'
+
+import os
+import time
+from fractions import Fraction
+from source import tool
+from source import constants as c
+from source.state import level
+
+LEVEL_NUM = 3
+SECONDS = 12
+SHOTS = ((85, -0.3), (90, -0.5), (70, -0.1))
+# render frames per second, 0 means no frame is drawn
+RENDER_RATES = (0, 30, 60, 144)
+
+def run_level(render_rate):
+    clock = tool.SimClock()
+    state = level.Level(clock, interpolate=True)
+    state.startup(0, {c.CURRENT_TIME:0, c.LEVEL_NUM:LEVEL_NUM, c.SCORE:0})
+    # exact times, so every rate runs the same number of updates
+    update_time = Fraction(1, c.PHYSICS_RATE)
+    frame_num = SECONDS * render_rate
+    update_num = SECONDS * c.PHYSICS_RATE
+    shots = list(SHOTS)
+    updates = 0
+    render_time = 0
+    lag = Fraction(0)
+    for frame in range(max(frame_num, 1)):
+        lag += Fraction(SECONDS, frame_num) if frame_num else SECONDS
+        while lag >= update_time and updates < update_num:
+            if shots and state.state == c.IDLE and updates % (update_num // len(SHOTS)) == 60:
+                state.shoot(*shots.pop(0))
+            state.update(None, clock.get_ticks(), None, False)
+            updates += 1
+            lag -= update_time
+        if frame_num:
+            start = time.perf_counter()
+            state.render(tool.SCREEN, float(lag / update_time))
+            render_time += time.perf_counter() - start
+    bodies = [tuple(item.phy.body.position) for item in state.physics.pigs + state.physics.blocks]
+    return (state.score, bodies), updates, render_time / max(frame_num, 1) * 1000
+
+def main():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tool.init()
+    # render() is called above, and update() gets no surface to draw
+    print('%12s %10s %10s %12s %14s' % ('render fps', 'frames', 'updates', 'render(ms)', 'same outcome'))
+    reference = None
+    for render_rate in RENDER_RATES:
+        outcome, updates, render_time = run_level(render_rate)
+        if reference is None:
+            reference = outcome
+        print('%12d %10d %10d %12.3f %14s' % (render_rate, SECONDS * render_rate, updates,
+              render_time, outcome == reference))
+
+if __name__ == '__main__':
+    main()
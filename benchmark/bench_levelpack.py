@@ -0,0 +1,67 @@
+'''Compare loading generated levels from json files and from a level pack,
+   for single large levels and for a pack of many levels.
+   run: python -m benchmark.bench_levelpack'''
+__author__ = 'marble_xu'
+
+import os
+import json
+import time
+import tempfile
+from source import levelpack
+from . import levelgen
+
+BLOCK_NUMS = (100, 1000, 5000)
+PACK_LEVEL_NUM = 200
+PACK_BLOCK_NUM = 300
+ROUNDS = 20
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def time_loads(json_paths, pack_path):
+    '''return the average time in milliseconds to load the records of all the levels
+       from the json files, which are compiled like the game does, and from the pack,
+       the pack time includes opening the pack'''
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        for level_num, path in enumerate(json_paths):
+            levelpack.compile_level(load_json(path), level_num)
+    json_time = (time.perf_counter() - start) / ROUNDS * 1000
+
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        pack = levelpack.LevelPack(pack_path)
+        for level_num in pack.get_level_nums():
+            pack.get_records(level_num)
+        pack.close()
+    pack_time = (time.perf_counter() - start) / ROUNDS * 1000
+    return json_time, pack_time
+
+def write_levels(directory, levels):
+    paths = []
+    for level_num, map_data in levels.items():
+        path = os.path.join(directory, 'level_%d.json' % level_num)
+        with open(path, 'w') as f:
+            json.dump(map_data, f, indent=4)
+        paths.append(path)
+    pack_path = os.path.join(directory, 'levels.pack')
+    levelpack.compile_pack(levels, pack_path)
+    sizes = (sum(os.path.getsize(path) for path in paths), os.path.getsize(pack_path))
+    return paths, pack_path, sizes
+
+def main():
+    print('%-18s %10s %10s %10s %10s %8s' % ('levels', 'json(KB)', 'pack(KB)',
+          'json(ms)', 'pack(ms)', 'speedup'))
+    cases = [('1 x %d blocks' % num, {1:levelgen.make_level(num)}) for num in BLOCK_NUMS]
+    cases.append(('%d x %d blocks' % (PACK_LEVEL_NUM, PACK_BLOCK_NUM),
+                  {i:levelgen.make_level(PACK_BLOCK_NUM, seed=i) for i in range(1, PACK_LEVEL_NUM + 1)}))
+    for name, levels in cases:
+        with tempfile.TemporaryDirectory() as directory:
+            paths, pack_path, sizes = write_levels(directory, levels)
+            json_time, pack_time = time_loads(paths, pack_path)
+        print('%-18s %10.1f %10.1f %10.3f %10.3f %7.2fx' % (name, sizes[0] / 1024,
+              sizes[1] / 1024, json_time, pack_time, json_time / pack_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+'''Measure the memory of the entities of a generated level, with the __slots__
+   classes and shared images, and with the same classes rebuilt to have a
+   __dict__ and to load their own images, as the classes were before.
+   The python objects are measured with tracemalloc, the pixels of the images
+   are counted separately because pygame allocates them outside of python.
+   run: python -m benchmark.bench_memory'''
+__author__ = 'marble_xu'
+
+import gc
+import tracemalloc
+import pymunk as pm
+from source import tool
+from source import constants as c
+from source.component import physics, bird, pig, block
+from . import levelgen
+
+BLOCK_NUM = 2000
+BIRD_TYPES = (c.RED_BIRD, c.BLUE_BIRD, c.YELLOW_BIRD, c.BLACK_BIRD, c.WHITE_BIRD, c.BIG_RED_BIRD)
+
+def make_dict_class(cls, classes):
+    '''return a copy of cls and its bases without __slots__'''
+    if cls is object:
+        return object
+    if cls not in classes:
+        slots = vars(cls).get('__slots__', ())
+        namespace = {name:value for name, value in vars(cls).items()
+                     if name not in slots and name not in ('__slots__', '__dict__', '__weakref__')}
+        bases = tuple(make_dict_class(base, classes) for base in cls.__bases__)
+        classes[cls] = type(cls.__name__, bases, namespace)
+    return classes[cls]
+
+def clear_shared_images():
+    # the frames cut from the sheets are shared by all the entities too
+    tool.FRAME_CACHE.clear()
+    bird.Bird.SHARED_IMAGES.clear()
+    pig.Pig.SHARED_IMAGES.clear()
+    block.Block.SHARED_IMAGES.clear()
+
+def create_entities(slotted):
+    '''create the pigs, blocks and birds of a level and their physics wrappers'''
+    classes = {}
+    def get_class(cls):
+        return cls if slotted else make_dict_class(cls, classes)
+
+    block_classes = {(c.GLASS, c.BEAM):block.BeamGlass, (c.WOOD, c.BEAM):block.BeamWood,
+                     (c.STONE, c.BEAM):block.BeamStone}
+    space = pm.Space()
+    entities = []
+    level_data = levelgen.make_level(BLOCK_NUM, pig_num=100)
+    for data in level_data[c.BLOCKS]:
+        if not slotted:
+            clear_shared_images()
+        item = get_class(block_classes[(data[c.MATERIAL], data[c.SHAPE])])(
+                        data['x'], data['y'], data[c.TYPE], c.HORIZONTAL)
+        x, y = physics.to_pymunk(item.rect.centerx, item.rect.centery)
+        item.phy = get_class(physics.PhyPolygon)((x, y), item.rect.w, item.rect.h, space, item.mass)
+        entities.append(item)
+    for data in level_data[c.PIGS]:
+        if not slotted:
+            clear_shared_images()
+        item = get_class(pig.NormalPig)(data['x'], data['y'])
+        x, y = physics.to_pymunk(item.rect.centerx, item.rect.centery)
+        item.phy = get_class(physics.PhyPig)(x, y, item.rect.w//2, space)
+        entities.append(item)
+    for i in range(100):
+        if not slotted:
+            clear_shared_images()
+        item = get_class(type(bird.create_bird(BIRD_TYPES[i % len(BIRD_TYPES)], 0, 0)))(0, 0)
+        item.phy = get_class(physics.PhyBird)(50, 0, 100, 100, space, item.get_radius(), item.mass)
+        entities.append(item)
+    return entities, space
+
+def get_image_bytes(entities):
+    surfaces = {}
+    for item in entities:
+        for value in [getattr(item, name, None) for name in ('images', 'images_list', 'frames')]:
+            stack = [value]
+            while stack:
+                value = stack.pop()
+                if isinstance(value, (list, tuple)):
+                    stack.extend(value)
+                elif value is not None:
+                    surfaces[id(value)] = value.get_width() * value.get_height() * value.get_bytesize()
+    return sum(surfaces.values())
+
+def measure(slotted):
+    clear_shared_images()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities, space = create_entities(slotted)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    num = len(entities)
+    return (after - before) / num, get_image_bytes(entities) / num, num
+
+def main():
+    tool.init(headless=True)
+    print('%8s %10s %16s %16s' % ('classes', 'entities', 'python(B/entity)', 'pixels(B/entity)'))
+    results = {}
+    for slotted in (False, True):
+        name = 'slots' if slotted else 'dict'
+        results[name] = measure(slotted)
+        python_bytes, pixel_bytes, num = results[name]
+        print('%8s %10d %16.0f %16.0f' % (name, num, python_bytes, pixel_bytes))
+    print('python objects: %.2fx smaller, pixels: %.0fx smaller' % (
+          results['dict'][0] / results['slots'][0], results['dict'][1] / results['slots'][1]))
+    clear_shared_images()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+'''Go through the levels with and without the prefetch of the next level, and
+   show the load time of every level and how much of it is exposed to the frame.
+   run: python -m benchmark.bench_prefetch'''
+__author__ = 'marble_xu'
+
+import os
+from source import tool
+from source import constants as c
+from source.state import level
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+FRAMES = 30 # frames played in a level before going to the next level
+
+def run_levels(prefetch):
+    clock = tool.SimClock()
+    state = level.Level(clock, prefetch=prefetch)
+    game_info = {c.CURRENT_TIME:0, c.LEVEL_NUM:LEVEL_NUMS[0], c.SCORE:0}
+    for level_num in LEVEL_NUMS:
+        game_info[c.LEVEL_NUM] = level_num
+        state.startup(clock.get_ticks(), game_info)
+        for i in range(FRAMES):
+            state.update(tool.SCREEN, clock.get_ticks(), None, False)
+    return state.load_stats
+
+def main():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tool.init()
+    # load the frames of all the sprites first, so both runs only measure the levels
+    run_levels(False)
+    results = [run_levels(False), run_levels(True)]
+    print('%6s %16s %16s %16s' % ('level', 'no prefetch(ms)', 'prefetch load(ms)', 'exposed(ms)'))
+    for sync, prefetch in zip(*results):
+        print('%6d %16.3f %16.3f %16.3f' % (sync[0], sync[2], prefetch[1], prefetch[2]))
+    exposed = sum(item[2] for item in results[1])
+    print('total exposed: no prefetch %.3fms, prefetch %.3fms' % (
+          sum(item[2] for item in results[0]), exposed))
+
+if __name__ == '__main__':
+    main()
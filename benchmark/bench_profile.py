@@ -0,0 +1,54 @@
+'''Profile the frames of a black bird shot into level 6 with the frame phase
+   profiler, print the timings of the phases, export them as json and compare
+   the frame time with profiling disabled to measure the profiler overhead.
+   run: python -m benchmark.bench_profile [--output profile.json]'''
+__author__ = 'marble_xu'
+
+import os
+import time
+import argparse
+from source import tool, profiler
+from source import constants as c
+from source.state import level
+
+LEVEL_NUM = 6
+FRAMES = 900
+SHOTS = ((80, -0.4), (90, -0.5), (85, -0.3))
+
+def run_level(profile):
+    '''return the average frame time in milliseconds of updating and drawing the level'''
+    if profile:
+        profiler.start()
+    clock = tool.SimClock()
+    state = level.Level(clock)
+    game_info = {c.CURRENT_TIME:0, c.LEVEL_NUM:LEVEL_NUM, c.SCORE:0}
+    state.startup(0, game_info)
+    surface = tool.SCREEN
+    shots = list(SHOTS)
+    start = time.perf_counter()
+    for frame in range(FRAMES):
+        if shots and state.state == c.IDLE and frame % (FRAMES // len(SHOTS)) == 1:
+            # tap in the air to use the ability of the bird
+            state.shoot(*shots.pop(0))
+        state.update(surface, clock.get_ticks(), None, frame % (FRAMES // len(SHOTS)) == 60)
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='profile the frame phases of a level')
+    parser.add_argument('--output', help='json file of the phase timings')
+    args = parser.parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tool.init()
+
+    disabled = run_level(False)
+    enabled = run_level(True)
+    for line in profiler.PROFILER.get_report():
+        print(line)
+    if args.output:
+        profiler.PROFILER.export(args.output)
+    profiler.stop()
+    print('frame time: %.3f ms disabled, %.3f ms profiled, overhead %.1f%%' %
+          (disabled, enabled, (enabled / disabled - 1) * 100))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+'''Measure the removal of entities from the physics:
+   1. removing the blocks of generated levels one by one with list.remove() and a
+      space.remove() call for each, against the EntitySet and one batched
+      space.remove() call of Physics.remove_pending().
+   2. the bodies left in the space and the frame time after the shots of the
+      shipped levels, with and without removing the bodies out of the world bounds.
+   3. a pig and a block put just past each side of the screen and the ground line
+      must be removed by the first update, the exit status is 1 if one is left.
+   run: python -m benchmark.bench_removal'''
+__author__ = 'marble_xu'
+
+import sys
+import time
+import random
+from source import tool, headless
+from source import constants as c
+from source.component import physics, block, pig
+from . import levelgen
+
+BLOCK_NUMS = (100, 300, 1000, 3000)
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+SHOTS = ((85, -0.3, 400), (90, -0.5, 300), (70, -0.1, None), (80, -0.4, 500))
+IDLE_FRAMES = 600
+
+def setup_physics(block_num):
+    phy = physics.Physics()
+    for data in levelgen.make_level(block_num)['blocks']:
+        phy.add_block(block.create_block(data['x'], data['y'], data['material'],
+                                         data['shape'], data['type']))
+    blocks = list(phy.blocks)
+    random.Random(0).shuffle(blocks)
+    return phy, blocks
+
+def remove_one_by_one(phy, blocks):
+    entities = list(phy.blocks)
+    for item in blocks:
+        shape = item.phy.shape
+        phy.space.remove(shape, shape.body)
+        entities.remove(item)
+        del phy.shape_to_entity[shape]
+
+def remove_batched(phy, blocks):
+    for item in blocks:
+        phy.remove_later(item, phy.blocks)
+    phy.remove_pending()
+
+def time_removal(block_num, remove):
+    best = None
+    for i in range(3):
+        phy, blocks = setup_physics(block_num)
+        start = time.perf_counter()
+        remove(phy, blocks)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def run_level(level_num):
+    sim = headless.Simulation(level_num)
+    for distance, angle, tap_time in SHOTS:
+        sim.shoot(distance, angle, tap_time)
+    start = time.perf_counter()
+    for i in range(IDLE_FRAMES):
+        sim.step()
+    elapsed = time.perf_counter() - start
+    return len(sim.level.physics.space.bodies), elapsed / IDLE_FRAMES * 1000
+
+def check_bounds():
+    '''return the names of the bounds a pig or block put just past is not removed
+       from the physics by one update. The bounds are the sides of the screen and
+       the ground line, with c.WORLD_MARGIN pixels around them'''
+    margin = c.WORLD_MARGIN + 1
+    # pygame positions of the centers
+    positions = (('left', (-margin, 300)), ('right', (c.SCREEN_WIDTH + margin, 300)),
+                 ('bottom', (c.SCREEN_WIDTH // 2, c.GROUND_HEIGHT + margin)))
+    failed = []
+    for name, center in positions:
+        phy = physics.Physics()
+        item = pig.create_pig(c.NORMAL_PIG, 0, 0)
+        item.rect.center = center
+        phy.add_pig(item)
+        item = block.create_block(0, 0, c.WOOD, c.BEAM, c.BEAM_TYPE_1)
+        item.rect.center = center
+        phy.add_block(item)
+        phy.update({c.CURRENT_TIME:0}, None, False)
+        if phy.pigs or phy.blocks or phy.space.bodies:
+            failed.append(name)
+    return failed
+
+def main():
+    tool.init(headless=True)
+    print('%8s %16s %14s %8s' % ('blocks', 'one by one(ms)', 'batched(ms)', 'speedup'))
+    for block_num in BLOCK_NUMS:
+        one = time_removal(block_num, remove_one_by_one)
+        batched = time_removal(block_num, remove_batched)
+        print('%8d %16.3f %14.3f %7.1fx' % (block_num, one, batched, one / batched))
+
+    print()
+    print('%6s %16s %14s %16s %14s' % ('level', 'no bound bodies', 'bound bodies',
+          'no bound(ms)', 'bound(ms)'))
+    bounds = c.WORLD_LEFT, c.WORLD_RIGHT, c.WORLD_BOTTOM
+    for level_num in LEVEL_NUMS:
+        c.WORLD_LEFT, c.WORLD_RIGHT, c.WORLD_BOTTOM = -1e9, 1e9, 1e9
+        free_bodies, free_time = run_level(level_num)
+        c.WORLD_LEFT, c.WORLD_RIGHT, c.WORLD_BOTTOM = bounds
+        bodies, frame_time = run_level(level_num)
+        print('%6d %16d %14d %16.3f %14.3f' % (level_num, free_bodies, bodies, free_time, frame_time))
+
+    print()
+    failed = check_bounds()
+    print('bodies past the world bounds removed by one update: %s' %
+          ('not at ' + ', '.join(failed) if failed else 'all'))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''Compare the frame time of drawing the whole Level scene and updating the whole
+   display with the dirty rect rendering, for an idle scene where nothing is
+   moving and an action scene where birds are shot into the structure.
+   run: python -m benchmark.bench_render'''
+__author__ = 'marble_xu'
+
+import os
+import time
+import pygame as pg
+from source import tool
+from source import constants as c
+from source.state import level
+
+LEVEL_NUM = 3
+FRAMES = 600
+SHOTS = ((85, -0.3), (90, -0.5), (70, -0.1))
+
+def run_scene(dirty_render, action):
+    '''return the average time in milliseconds of drawing and updating the display,
+       and the average part of the screen updated per frame'''
+    clock = tool.SimClock()
+    state = level.Level(clock)
+    state.dirty_render = dirty_render
+    game_info = {c.CURRENT_TIME:0, c.LEVEL_NUM:LEVEL_NUM, c.SCORE:0}
+    state.startup(0, game_info)
+    # the headless mode skips drawing, so call draw() directly
+    surface = tool.SCREEN
+    screen_area = surface.get_width() * surface.get_height()
+    shots = list(SHOTS) if action else []
+    render_time = 0
+    updated = 0
+    for frame in range(FRAMES):
+        if shots and state.state == c.IDLE and frame % (FRAMES // len(SHOTS)) == 1:
+            state.shoot(*shots.pop(0))
+        state.update(surface, clock.get_ticks(), None, False)
+        start = time.perf_counter()
+        state.draw(surface)
+        if state.dirty_rects is None:
+            pg.display.update()
+            updated += screen_area
+        else:
+            pg.display.update(state.dirty_rects)
+            updated += sum(rect.w * rect.h for rect in state.dirty_rects)
+        render_time += time.perf_counter() - start
+    return render_time / FRAMES * 1000, updated / FRAMES / screen_area
+
+def main():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tool.init()
+    # draw() is called above, skip the draw in Level.update
+    tool.HEADLESS = True
+    print('%8s %14s %14s %10s %14s' % ('scene', 'full(ms)', 'dirty(ms)', 'speedup', 'dirty area'))
+    for name, action in (('idle', False), ('action', True)):
+        full, _ = run_scene(False, action)
+        dirty, area = run_scene(True, action)
+        print('%8s %14.3f %14.3f %9.2fx %13.1f%%' % (name, full, dirty, full / dirty, area * 100))
+    tool.HEADLESS = False
+
+if __name__ == '__main__':
+    main()
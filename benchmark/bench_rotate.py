@@ -0,0 +1,32 @@
+'''Count the image rotations done per frame on the shipped levels, a rotation is
+   only done for a rotate cache miss, the structures at rest should always hit.
+   run: python -m benchmark.bench_rotate'''
+__author__ = 'marble_xu'
+
+import time
+from source import tool, headless
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+SETTLE_FRAMES = 60
+MEASURE_FRAMES = 300
+
+def main():
+    tool.init(headless=True)
+    print('%6s %12s %12s %10s %12s' % ('level', 'lookups/f', 'rotates/f', 'hit rate', 'frame(ms)'))
+    for level_num in LEVEL_NUMS:
+        tool.ROTATE_CACHE.clear()
+        sim = headless.Simulation(level_num)
+        for i in range(SETTLE_FRAMES):
+            sim.step()
+        cache = tool.ROTATE_CACHE
+        hits, misses = cache.hits, cache.misses
+        start = time.perf_counter()
+        for i in range(MEASURE_FRAMES):
+            sim.step()
+        frame_ms = (time.perf_counter() - start) / MEASURE_FRAMES * 1000
+        hits, misses = cache.hits - hits, cache.misses - misses
+        print('%6d %12.1f %12.2f %9.1f%% %12.3f' % (level_num, (hits + misses) / MEASURE_FRAMES,
+              misses / MEASURE_FRAMES, hits / max(1, hits + misses) * 100, frame_ms))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+'''Compare the frame update time of the shipped levels with and without body
+   sleeping, a shot is fired into each level and the frames are measured until
+   the structure is at rest again.
+   run: python -m benchmark.bench_sleep'''
+__author__ = 'marble_xu'
+
+import time
+from source import tool, headless
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+SHOT = (90, -0.35)
+FRAMES = 1800
+
+def run_level(level_num, sleep_time_threshold):
+    sim = headless.Simulation(level_num)
+    sim.level.physics.sleep_time_threshold = sleep_time_threshold
+    sim.level.reset()
+    start = time.perf_counter()
+    sim.shoot(*SHOT)
+    while sim.frame_num < FRAMES:
+        sim.step()
+    elapsed = time.perf_counter() - start
+    bodies = [item.phy.body for item in sim.level.physics.blocks + sim.level.physics.pigs]
+    awake = len([body for body in bodies if not body.is_sleeping])
+    return elapsed / sim.frame_num * 1000, awake, len(bodies), sim.level.score
+
+def main():
+    tool.init(headless=True)
+    print('%6s %14s %14s %8s %12s %8s' % ('level', 'no sleep(ms)', 'sleep(ms)',
+          'speedup', 'awake/total', 'score'))
+    for level_num in LEVEL_NUMS:
+        no_sleep, _, _, score1 = run_level(level_num, float('inf'))
+        sleep, awake, total, score2 = run_level(level_num, 0.5)
+        print('%6d %14.3f %14.3f %7.2fx %6d/%-5d %8s' % (level_num, no_sleep, sleep,
+              no_sleep / sleep, awake, total, '%d/%d' % (score1, score2)))
+
+if __name__ == '__main__':
+    main()
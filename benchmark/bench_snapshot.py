@@ -0,0 +1,60 @@
+'''Compare the cost of Level.snapshot() and Level.restore() with Level.reset()
+   on the shipped levels, the snapshot is taken after the first shot. Every restore
+   and reset follows a branch, the second bird shot from the snapshot and simulated
+   for a while, and the branches must end the same, which is shown in the last column.
+   run: python -m benchmark.bench_snapshot'''
+__author__ = 'marble_xu'
+
+import time
+import timeit
+from source import tool, headless
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+SHOT = (90, -0.35)
+BRANCH_SHOT = (85, -0.3)
+BRANCH_FRAMES = 100
+NUMBER = 50
+
+def get_bodies_state(level):
+    phy = level.physics
+    return [(tuple(item.phy.body.position), item.phy.body.angle)
+            for item in phy.birds + phy.pigs + phy.blocks]
+
+def run_branch(level):
+    level.shoot(*BRANCH_SHOT)
+    for i in range(BRANCH_FRAMES):
+        level.update(None, level.clock.get_ticks(), None, False)
+    return level.score, get_bodies_state(level)
+
+def main():
+    tool.init(headless=True)
+    print('%6s %14s %14s %14s %10s' % ('level', 'snapshot(us)', 'restore(us)', 'reset(us)',
+          'same'))
+    for level_num in LEVEL_NUMS:
+        sim = headless.Simulation(level_num)
+        sim.shoot(*SHOT)
+        level = sim.level
+        snapshot = level.snapshot()
+        take = timeit.timeit(level.snapshot, number=NUMBER) / NUMBER
+        restore = 0
+        outcomes = []
+        for i in range(NUMBER):
+            start = time.perf_counter()
+            level.restore(snapshot)
+            restore += time.perf_counter() - start
+            outcomes.append(run_branch(level))
+        restore /= NUMBER
+        same = sum(1 for outcome in outcomes if outcome == outcomes[0])
+        reset = 0
+        for i in range(NUMBER):
+            level.restore(snapshot)
+            run_branch(level)
+            start = time.perf_counter()
+            level.reset()
+            reset += time.perf_counter() - start
+        reset /= NUMBER
+        print('%6d %14.1f %14.1f %14.1f %7d/%d' % (level_num, take * 1e6, restore * 1e6,
+              reset * 1e6, same, NUMBER))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+'''Compare the time to sync the sprite positions from the bodies after the physics
+   steps, one entity at a time and with numpy arrays, for generated levels.
+   run: python -m benchmark.bench_sync'''
+__author__ = 'marble_xu'
+
+import random
+import timeit
+from source import tool
+from source.component import physics, block, pig
+from . import levelgen
+
+BLOCK_NUMS = (100, 1000, 5000)
+
+def setup_physics(block_num):
+    phy = physics.Physics()
+    level_data = levelgen.make_level(block_num)
+    for data in level_data['blocks']:
+        phy.add_block(block.create_block(data['x'], data['y'], data['material'],
+                                         data['shape'], data['type']))
+    for data in level_data['pigs']:
+        phy.add_pig(pig.create_pig(data['type'], data['x'], data['y']))
+    # the bodies of a collapsing structure have all kinds of angles
+    rand = random.Random(0)
+    for item in phy.pigs + phy.blocks:
+        item.phy.body.angle = rand.uniform(-3.14, 3.14)
+    return phy
+
+def main():
+    tool.init(headless=True)
+    print('%8s %14s %14s %8s' % ('blocks', 'each(ms)', 'bulk(ms)', 'speedup'))
+    for block_num in BLOCK_NUMS:
+        phy = setup_physics(block_num)
+        pigs, blocks = phy.pigs, phy.blocks
+        number = max(1, 20000 // block_num)
+        # the first call fills the rotate cache for both
+        phy.sync_each(pigs, blocks)
+        each = timeit.timeit(lambda: phy.sync_each(pigs, blocks), number=number) / number * 1000
+        bulk = timeit.timeit(lambda: phy.sync_bulk(pigs, blocks), number=number) / number * 1000
+        print('%8d %14.3f %14.3f %7.2fx' % (block_num, each, bulk, each / bulk))
+
+if __name__ == '__main__':
+    main()
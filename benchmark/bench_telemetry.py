@@ -0,0 +1,88 @@
+'''Compare the cost of the game events of a shot: recording disabled, recording
+   into the telemetry ring buffer with the writer thread, and the old print() of
+   the collision handlers into /dev/null. The cost of a single record() call is
+   measured too, and the events recorded while the writer thread flushes every
+   millisecond must all reach the subscriber in order, the exit status is 1 if not.
+   run: python -m benchmark.bench_telemetry'''
+__author__ = 'marble_xu'
+
+import os
+import sys
+import time
+import timeit
+import tempfile
+from source import tool, headless, telemetry
+
+LEVEL_NUMS = (1, 2, 3)
+SHOT = (90, -0.35)
+FRAMES = 600
+RECORD_NUM = 200000
+CHECK_SIZE = 1024
+CHECK_INTERVAL = 0.001
+
+class PrintRecorder():
+    '''writes every event with print() like the collision handlers did'''
+    def record(self, *event):
+        print(*event)
+
+def run_level(level_num, mode):
+    sim = headless.Simulation(level_num)
+    events = []
+    stdout = sys.stdout
+    if mode == 'record':
+        recorder = telemetry.start(os.path.join(tempfile.gettempdir(), 'telemetry.jsonl'))
+        recorder.subscribe(events.extend)
+    elif mode == 'print':
+        telemetry.RECORDER = PrintRecorder()
+        sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    sim.shoot(*SHOT)
+    while sim.frame_num < FRAMES:
+        sim.step()
+    elapsed = time.perf_counter() - start
+    if mode == 'print':
+        sys.stdout.close()
+        sys.stdout = stdout
+        telemetry.RECORDER = None
+    else:
+        telemetry.stop()
+    return elapsed / sim.frame_num * 1000, len(events)
+
+def check_order():
+    '''record RECORD_NUM events into a small buffer while the writer thread flushes,
+       return (events received, events dropped, True if the received are in order)'''
+    recorder = telemetry.Recorder(size=CHECK_SIZE, interval=CHECK_INTERVAL)
+    events = []
+    recorder.subscribe(events.extend)
+    for i in range(RECORD_NUM):
+        recorder.record(telemetry.SHOT, i, 'bird', 0, 0)
+    recorder.close()
+    times = [event[1] for event in events]
+    ordered = all(a < b for a, b in zip(times, times[1:]))
+    return len(events), recorder.dropped, ordered
+
+def main():
+    tool.init(headless=True)
+    print('%6s %14s %14s %14s %8s' % ('level', 'disabled(ms)', 'record(ms)', 'print(ms)', 'events'))
+    for level_num in LEVEL_NUMS:
+        disabled, _ = run_level(level_num, None)
+        record, event_num = run_level(level_num, 'record')
+        printed, _ = run_level(level_num, 'print')
+        print('%6d %14.3f %14.3f %14.3f %8d' % (level_num, disabled, record, printed, event_num))
+
+    recorder = telemetry.Recorder(interval=3600)
+    cost = timeit.timeit(lambda: recorder.record(telemetry.DAMAGE, 0, 'pig', 1.0, 1000.0, 9.0),
+                         number=RECORD_NUM)
+    recorder.close()
+    check = timeit.timeit(lambda: telemetry.RECORDER and telemetry.RECORDER.record(), number=RECORD_NUM)
+    print('record(): %.0f ns per event, disabled check: %.0f ns' %
+          (cost / RECORD_NUM * 1e9, check / RECORD_NUM * 1e9))
+
+    received, dropped, ordered = check_order()
+    print('concurrent flush: %d received, %d dropped, %s' %
+          (received, dropped, 'in order' if ordered else 'out of order'))
+    if received + dropped != RECORD_NUM or not ordered:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+'''Fire the launches found by trajectory.solve_launch at the pigs of the shipped
+   levels through Level.shoot, and measure how close the flying bird passes the
+   center of the target pig, with the pigs and blocks removed so nothing stops the
+   bird, and the pigs killed by the same shot in the full level.
+   The time of solving the launches of many targets in one batch is measured too.
+   run: python -m benchmark.bench_trajectory'''
+__author__ = 'marble_xu'
+
+import time
+import numpy as np
+from source import tool, headless
+from source import constants as c
+from source.component import trajectory
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+MAX_FLIGHT_FRAMES = 300
+BATCH_TARGET_NUM = 1000
+
+def choose_launch(distance, angle):
+    '''return the launch of the longest sling distance with a solution, the low arc
+       is preferred, None if the target can't be reached'''
+    for i in range(distance.shape[0] - 1, -1, -1):
+        for arc in range(2):
+            if not np.isnan(angle[i, arc]):
+                return distance[i, arc], angle[i, arc]
+    return None
+
+def get_segment_distance(point, start, end):
+    '''return the distance from point to the segment from start to end'''
+    point, start, end = np.array(point, dtype=float), np.array(start), np.array(end)
+    line = end - start
+    length2 = line.dot(line)
+    t = 0 if length2 == 0 else np.clip((point - start).dot(line) / length2, 0, 1)
+    return float(np.hypot(*(start + t * line - point)))
+
+def get_miss(level_num, target, launch):
+    '''return the closest distance in pixels of the path of the launch to target'''
+    sim = headless.Simulation(level_num)
+    phy = sim.level.physics
+    for item in list(phy.pigs):
+        phy.remove_later(item, phy.pigs)
+    for item in list(phy.blocks):
+        phy.remove_later(item, phy.blocks)
+    phy.remove_pending()
+    sim.level.shoot(*launch)
+    bird = next(iter(phy.birds))
+    # the pygame position of the body, to_pygame() rounds it to pixels
+    get_pos = lambda: (bird.phy.body.position.x, 600 - bird.phy.body.position.y)
+    miss = float('inf')
+    last = get_pos()
+    for i in range(MAX_FLIGHT_FRAMES):
+        sim.step()
+        if bird.state == c.DEAD or bird.collide:
+            break
+        pos = get_pos()
+        miss = min(miss, get_segment_distance(target, last, pos))
+        last = pos
+    return miss
+
+def fire(level_num, pig_index):
+    '''return (sling distance, angle, miss in pixels, pigs killed) of the solved launch
+       at the pig, None if there is no launch'''
+    sim = headless.Simulation(level_num)
+    level = sim.level
+    pig = list(level.physics.pigs)[pig_index]
+    target = pig.rect.center
+    distance, angle = trajectory.solve_launch([target], level.active_bird.name)
+    launch = choose_launch(distance[0], angle[0])
+    if launch is None:
+        return None
+
+    pig_num = len(level.physics.pigs)
+    sim.shoot(*launch)
+    return launch + (get_miss(level_num, target, launch), pig_num - len(level.physics.pigs))
+
+def main():
+    tool.init(headless=True)
+    print('%6s %4s %10s %8s %10s %12s' % ('level', 'pig', 'distance', 'angle',
+          'miss(px)', 'pigs killed'))
+    for level_num in LEVEL_NUMS:
+        pig_num = len(headless.Simulation(level_num).level.physics.pigs)
+        for pig_index in range(pig_num):
+            result = fire(level_num, pig_index)
+            if result is None:
+                print('%6d %4d %10s' % (level_num, pig_index, 'no launch'))
+            else:
+                print('%6d %4d %10.1f %8.3f %10.1f %12d' % ((level_num, pig_index) + result))
+
+    rand = np.random.RandomState(0)
+    targets = np.stack((rand.uniform(200, c.SCREEN_WIDTH, BATCH_TARGET_NUM),
+                        rand.uniform(100, c.GROUND_HEIGHT, BATCH_TARGET_NUM)), axis=1)
+    start = time.perf_counter()
+    trajectory.solve_launch(targets, c.RED_BIRD)
+    elapsed = time.perf_counter() - start
+    print('solved %d targets x 81 distances in %.3f ms' % (BATCH_TARGET_NUM, elapsed * 1000))
+
+if __name__ == '__main__':
+    main()
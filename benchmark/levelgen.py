@@ -0,0 +1,26 @@
+__author__ = 'marble_xu'
+
+import random
+from source import constants as c
+
+def make_level(block_num, pig_num=5, bird_num=4, seed=0):
+    '''generate the map data of a level in the same format as the json files in
+       source/data/map: the blocks are stacked in columns between the sling and the
+       right side of the screen, the pigs are put on the ground before the columns'''
+    rand = random.Random(seed)
+    materials = [c.GLASS, c.WOOD, c.STONE]
+    column_num = 18
+    column_width = 40
+    beam_height = 18
+    blocks = []
+    for i in range(block_num):
+        column, row = i % column_num, i // column_num
+        blocks.append({'x':440 + column * column_width,
+                       'y':c.GROUND_HEIGHT - row * beam_height,
+                       c.MATERIAL:rand.choice(materials),
+                       c.SHAPE:c.BEAM, c.TYPE:c.BEAM_TYPE_1})
+    pigs = []
+    for i in range(pig_num):
+        pigs.append({c.TYPE:c.NORMAL_PIG, 'x':300 + i * 30, 'y':c.GROUND_HEIGHT})
+    birds = [{c.TYPE:c.RED_BIRD} for i in range(bird_num)]
+    return {c.BIRDS:birds, c.PIGS:pigs, c.BLOCKS:blocks}
@@ -0,0 +1,270 @@
+'''Benchmark suite of the shipped levels: every level is loaded, a fixed sequence
+   of shots is fired and these are measured:
+       reset               time of Level.reset, which loads the level
+       sim_speed           game time simulated per Physics.update time, which
+                           doesn't count fewer physics steps as slower
+       update_mean         mean time of Physics.update
+       update_p99          99th percentile time of Physics.update
+       draw_mean           mean time of Level.draw into an offscreen surface
+       peak_memory_kb      peak of the python memory allocated by the run
+   The timings depend on the machine, so a calibration loop of pymunk steps,
+   pygame blits and python code, which runs no code of the game, is timed in the
+   same process and the timings are divided by its time. The written results and
+   the baseline hold these normalized timings, the time metrics are in calibration
+   loops and sim_speed is in seconds of game time per calibration loop, so a
+   baseline saved on one machine can be compared on another.
+   The results are written as json and compared with a baseline file, a metric
+   worse than the baseline by more than the threshold percent is a regression,
+   and the exit status is 1.
+   run: python -m benchmark.suite --output results.json
+        python -m benchmark.suite --baseline benchmark/baseline.json --threshold 15
+        python -m benchmark.suite --baseline benchmark/baseline.json --save-baseline'''
+__author__ = 'marble_xu'
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pygame as pg
+import pymunk as pm
+from source import tool
+from source import constants as c
+from source.state import level
+
+LEVEL_NUMS = (1, 2, 3, 4, 5, 6)
+# distance, angle, the game time after the launch to tap for the ability of the bird
+SHOTS = ((85, -0.3, 400), (90, -0.5, 300), (70, -0.1, None), (80, -0.4, 500))
+MAX_SHOT_TIME = 8000
+RESET_NUM = 10
+CALIBRATION_BOXES = 40
+CALIBRATION_STEPS = 100
+CALIBRATION_NUM = 3
+
+HIGHER = 1
+LOWER = -1
+# the metrics compared with the baseline and the direction which is better
+METRICS = {'reset':LOWER,
+           'sim_speed':HIGHER,
+           'update_mean':LOWER,
+           'update_p99':LOWER,
+           'draw_mean':LOWER,
+           'peak_memory_kb':LOWER}
+# the metrics measured in milliseconds, and in game seconds per second, which
+# are divided and multiplied by the calibration time
+TIME_METRICS = ('reset', 'update_mean', 'update_p99', 'draw_mean')
+SPEED_METRICS = ('sim_speed',)
+
+def run_calibration():
+    '''return the time in milliseconds of a fixed work like a frame of the game:
+       a pile of boxes falling on a ground is stepped, the positions of the boxes
+       are read and an image is blitted at every box'''
+    space = pm.Space()
+    space.gravity = (0, -700)
+    ground = pm.Segment(space.static_body, (0, 0), (c.SCREEN_WIDTH, 0), 5)
+    ground.friction = 1
+    space.add(ground)
+    bodies = []
+    for i in range(CALIBRATION_BOXES):
+        body = pm.Body(5, pm.moment_for_box(5, (20, 20)))
+        body.position = (300 + (i % 10) * 21, 20 + (i // 10) * 21)
+        shape = pm.Poly.create_box(body, (20, 20))
+        shape.friction = 0.5
+        space.add(body, shape)
+        bodies.append(body)
+    surface = pg.Surface((c.SCREEN_WIDTH, c.SCREEN_HEIGHT))
+    image = pg.Surface((20, 20))
+    start = time.perf_counter()
+    for i in range(CALIBRATION_STEPS):
+        space.step(0.002)
+        for body in bodies:
+            x, y = body.position
+            surface.blit(image, (x, c.SCREEN_HEIGHT - y))
+    elapsed = time.perf_counter() - start
+    space.remove(*space.shapes)
+    space.remove(*bodies)
+    return elapsed * 1000
+
+def calibrate():
+    '''return the best time in milliseconds of CALIBRATION_NUM calibration loops'''
+    return min(run_calibration() for i in range(CALIBRATION_NUM))
+
+def normalize(result, calibration_ms):
+    '''change the timings of the result of a level run to calibration loops'''
+    for name in TIME_METRICS:
+        result[name] /= calibration_ms
+    for name in SPEED_METRICS:
+        result[name] *= calibration_ms / 1000
+
+def create_level(level_num):
+    clock = tool.SimClock()
+    state = level.Level(clock)
+    game_info = {c.CURRENT_TIME:0, c.LEVEL_NUM:level_num, c.SCORE:0}
+    state.startup(0, game_info)
+    return state, clock
+
+def run_shots(state, clock, surface, on_update=None, on_draw=None):
+    '''fire SHOTS into the level, on_update and on_draw are called with the
+       time in seconds of every Physics.update and Level.draw'''
+    physics = state.physics
+    update = physics.update
+    def timed_update(*args):
+        start = time.perf_counter()
+        update(*args)
+        if on_update:
+            on_update(time.perf_counter() - start)
+    physics.update = timed_update
+
+    for distance, angle, tap_time in SHOTS:
+        if not state.shoot(distance, angle):
+            break
+        start_time = clock.get_ticks()
+        while state.state == c.ATTACK:
+            elapsed = clock.get_ticks() - start_time
+            if elapsed > MAX_SHOT_TIME:
+                break
+            mouse_pressed = tap_time is not None and elapsed >= tap_time
+            state.update(surface, clock.get_ticks(), None, mouse_pressed)
+            start = time.perf_counter()
+            state.draw(surface)
+            if on_draw:
+                on_draw(time.perf_counter() - start)
+    del physics.update
+
+def run_level(level_num, surface):
+    '''return the result of a level run, the timings are in milliseconds and
+       sim_speed is in game seconds per second'''
+    state, clock = create_level(level_num)
+    reset_time = 0
+    for i in range(RESET_NUM):
+        start = time.perf_counter()
+        state.reset()
+        reset_time += time.perf_counter() - start
+
+    update_times = []
+    draw_times = []
+    start_time = clock.get_ticks()
+    run_shots(state, clock, surface, update_times.append, draw_times.append)
+    game_time = (clock.get_ticks() - start_time) / 1000
+    update_times = np.array(update_times)
+    return {'reset':reset_time / RESET_NUM * 1000,
+            'sim_speed':game_time / update_times.sum(),
+            'update_mean':update_times.mean() * 1000,
+            'update_p99':np.percentile(update_times, 99) * 1000,
+            'draw_mean':np.mean(draw_times) * 1000,
+            'frames':len(update_times),
+            'score':state.score}
+
+def get_peak_memory(level_num, surface):
+    '''return the peak python memory in KB of loading the level and firing the shots,
+       the rotate cache starts empty, or the peak depends on the levels run before'''
+    rotate_cache, tool.ROTATE_CACHE = tool.ROTATE_CACHE, tool.RotateCache()
+    tracemalloc.start()
+    state, clock = create_level(level_num)
+    run_shots(state, clock, surface)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    tool.ROTATE_CACHE = rotate_cache
+    return peak / 1024
+
+def run_suite(level_nums, repeat):
+    '''return the results of the levels with the timings normalized, and the
+       calibration times in milliseconds, the timings are the best of the repeats'''
+    surface = tool.SCREEN
+    # the repeats run in rounds over all the levels, so a slow period of the
+    # machine does not spoil all the runs of one level. The calibration runs
+    # after every level run for the same reason, and the median is used
+    rounds = []
+    calibrations = [calibrate()]
+    for i in range(repeat):
+        runs = []
+        for level_num in level_nums:
+            runs.append(run_level(level_num, surface))
+            calibrations.append(calibrate())
+        rounds.append(runs)
+    calibration_ms = np.median(calibrations)
+    results = {}
+    for i, level_num in enumerate(level_nums):
+        runs = [level_runs[i] for level_runs in rounds]
+        result = runs[0]
+        for name, better in METRICS.items():
+            if name in result:
+                values = [run[name] for run in runs]
+                result[name] = max(values) if better == HIGHER else min(values)
+        normalize(result, calibration_ms)
+        result['peak_memory_kb'] = get_peak_memory(level_num, surface)
+        results[str(level_num)] = result
+    return results, calibrations
+
+def compare(results, baseline, threshold):
+    '''print the change of every metric from the baseline, return the regressions'''
+    regressions = []
+    print('%6s %-18s %12s %12s %9s' % ('level', 'metric', 'baseline', 'current', 'change'))
+    for level_num, result in results.items():
+        if level_num not in baseline:
+            continue
+        old_result = baseline[level_num]
+        for name, better in METRICS.items():
+            old, new = old_result.get(name), result[name]
+            if not old:
+                continue
+            change = (new / old - 1) * 100
+            regressed = change * better < -threshold
+            if regressed:
+                regressions.append((level_num, name))
+            print('%6s %-18s %12.4g %12.4g %+8.1f%%%s' % (level_num, name, old, new, change,
+                  '  REGRESSION' if regressed else ''))
+        if old_result.get('score') != result['score']:
+            print('%6s score changed from %s to %s' % (level_num, old_result.get('score'),
+                  result['score']))
+    return regressions
+
+def print_results(results):
+    counts = ['frames', 'score']
+    print('%6s ' % 'level' + ' '.join('%16s' % name for name in list(METRICS) + counts))
+    for level_num, result in results.items():
+        print('%6s ' % level_num + ' '.join('%16.4g' % result[name] for name in METRICS) +
+              ' ' + ' '.join('%16d' % result[name] for name in counts))
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the shipped levels')
+    parser.add_argument('--level', type=int, nargs='+', default=LEVEL_NUMS)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of every level, the best timing is kept')
+    parser.add_argument('--output', help='json file of the results')
+    parser.add_argument('--baseline', help='json file of the results to compare with')
+    parser.add_argument('--threshold', type=float, default=15.0,
+                        help='percent a metric can be worse than the baseline')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline file instead of comparing')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tool.init()
+    # draw() is called by run_shots, skip the draw in Level.update
+    tool.HEADLESS = True
+    results, calibrations = run_suite(args.level, args.repeat)
+    tool.HEADLESS = False
+    print_results(results)
+    print('calibration loop: median %.3f ms, %.3f to %.3f ms' % (np.median(calibrations),
+          min(calibrations), max(calibrations)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        if args.save_baseline:
+            with open(args.baseline, 'w') as f:
+                json.dump(results, f, indent=1)
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            regressions = compare(results, baseline, args.threshold)
+            if regressions:
+                print('%d regressions over %.1f%%' % (len(regressions), args.threshold))
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,33 +3,41 @@ __author__ = 'marble_xu'
 import random
 import pygame as pg
 from .. import tool
+from .. import telemetry
 from .. import constants as c
 
 def create_bird(type, x, y):
-    bird = None
-    if type == c.RED_BIRD:
-        bird = RedBird(x, y)
-    elif type == c.BLUE_BIRD:
-        bird = BlueBird(x, y)
-    elif type == c.YELLOW_BIRD:
-        bird = YellowBird(x, y)
-    elif type == c.BLACK_BIRD:
-        bird = BlackBird(x, y)
-    elif type == c.WHITE_BIRD:
-        bird = WhiteBird(x, y)
-    elif type == c.BIG_RED_BIRD:
-        bird = BigRedBird(x, y)
-    return bird
+    bird_class = BIRD_CLASSES.get(type)
+    if bird_class is None:
+        return None
+    return bird_class(x, y)
+
+def get_bird_mass(name):
+    if name == c.BIG_RED_BIRD:
+        return 8.0
+    return 5.0
 
 class Bird():
+    __slots__ = ('name', 'frames', 'frame_index', 'frame_num', 'animate_timer', 'image',
+                 'rect', 'angle_degree', 'state', 'old_pos', 'pos_timer', 'path_timer',
+                 'collide', 'mass', 'phy', 'current_time')
+    # the values changed during the game, they are saved and loaded by the level snapshot
+    STATE_ATTRS = ('frames', 'frame_num', 'frame_index', 'animate_timer', 'image',
+                   'angle_degree', 'state', 'old_pos', 'pos_timer', 'path_timer',
+                   'collide', 'phy')
+    # the frame lists loaded by load_images, they are shared by the birds of the same type
+    IMAGE_ATTRS = ('frames',)
+    # bird name: values of IMAGE_ATTRS
+    SHARED_IMAGES = {}
+    animate_interval = 100
+
     def __init__(self, x, y, name):
         self.frames = []
         self.frame_index = 0
         self.animate_timer = 0
-        self.animate_interval = 100
 
         self.name = name
-        self.load_images()
+        self.setup_images()
         self.frame_num = len(self.frames)
         self.image = self.frames[self.frame_index]
         self.rect = self.image.get_rect()
@@ -41,7 +49,8 @@ class Bird():
         self.pos_timer = 0
         self.path_timer = 0
         self.collide = False # collided with ground or shape if it is True
-        self.mass = 5.0
+        self.mass = get_bird_mass(name)
+        self.phy = None
 
     def load_frames(self, sheet, frame_rect_list, scale, color=c.WHITE):
         frames = []
@@ -52,6 +61,14 @@ class Bird():
     def load_images(self):
         pass
 
+    def setup_images(self):
+        shared = Bird.SHARED_IMAGES.get(self.name)
+        if shared is None:
+            self.load_images()
+            shared = Bird.SHARED_IMAGES[self.name] = [getattr(self, name) for name in self.IMAGE_ATTRS]
+        for name, value in zip(self.IMAGE_ATTRS, shared):
+            setattr(self, name, value)
+
     def update(self, game_info, level, mouse_pressed):
         self.current_time = game_info[c.CURRENT_TIME]
         self.handle_state(level, mouse_pressed)
@@ -115,7 +132,7 @@ class Bird():
             self.animate_timer = self.current_time
         
         image = self.frames[self.frame_index]
-        self.image = pg.transform.rotate(image, self.angle_degree)
+        self.image = tool.rotate_image(image, self.angle_degree)
 
     def change_image(self, frames):
         self.frames = frames
@@ -130,6 +147,15 @@ class Bird():
     def set_physics(self, phy):
         self.phy = phy
 
+    def save_state(self):
+        return (tuple(self.rect), [getattr(self, name) for name in self.STATE_ATTRS])
+
+    def load_state(self, state):
+        rect, values = state
+        self.rect = pg.Rect(rect)
+        for name, value in zip(self.STATE_ATTRS, values):
+            setattr(self, name, value)
+
     def set_collide(self):
         self.collide = True
 
@@ -151,6 +177,8 @@ class Bird():
         surface.blit(self.image, self.rect)
 
 class RedBird(Bird):
+    __slots__ = ()
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.RED_BIRD)
 
@@ -161,6 +189,9 @@ class RedBird(Bird):
         self.frames = self.load_frames(sheet, frame_rect_list, c.BIRD_MULTIPLIER)
 
 class BlueBird(Bird):
+    __slots__ = ('clicked',)
+    STATE_ATTRS = Bird.STATE_ATTRS + ('clicked',)
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.BLUE_BIRD)
         self.clicked = False
@@ -186,9 +217,14 @@ class BlueBird(Bird):
                 old = self.phy.body.velocity
                 vec_y = old[1] * 0.5 * sign
                 bird.phy.body.velocity = (old[0], vec_y)
-                print('bluebird:[', x, ',', y, ']', 'old:', old, '  new:', bird.phy.body.velocity)
+                if telemetry.RECORDER:
+                    telemetry.RECORDER.record(telemetry.SPAWN, self.current_time, bird.name,
+                                              x, y, old[0], vec_y)
 
 class YellowBird(Bird):
+    __slots__ = ('clicked',)
+    STATE_ATTRS = Bird.STATE_ATTRS + ('clicked',)
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.YELLOW_BIRD)
         self.clicked = False
@@ -204,9 +240,15 @@ class YellowBird(Bird):
             self.clicked = True
             # speed velocity of bird when first mouse click
             self.phy.body.velocity = self.phy.body.velocity * 3
-            print('yellow bird:', self.phy.body.velocity)
+            if telemetry.RECORDER:
+                telemetry.RECORDER.record(telemetry.ABILITY, self.current_time, self.name,
+                                          *self.phy.body.velocity)
 
 class BlackBird(Bird):
+    __slots__ = ('clicked', 'init_explode_show', 'exploded', 'init_explode_frames', 'explode_frames')
+    STATE_ATTRS = Bird.STATE_ATTRS + ('clicked', 'init_explode_show', 'exploded')
+    IMAGE_ATTRS = Bird.IMAGE_ATTRS + ('init_explode_frames', 'explode_frames')
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.BLACK_BIRD)
         self.clicked = False
@@ -250,6 +292,9 @@ class BlackBird(Bird):
             self.exploded = True
 
 class WhiteBird(Bird):
+    __slots__ = ('clicked',)
+    STATE_ATTRS = Bird.STATE_ATTRS + ('clicked',)
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.WHITE_BIRD)
         self.clicked = False
@@ -267,8 +312,15 @@ class WhiteBird(Bird):
             self.phy.body.velocity = (vel_x * 2, vel_y + 1000)
             egg = Egg(self.rect.centerx, self.rect.bottom + 30)
             level.physics.add_egg(egg)
+            if telemetry.RECORDER:
+                telemetry.RECORDER.record(telemetry.SPAWN, self.current_time, egg.name,
+                                          egg.rect.centerx, egg.rect.centery, *egg.phy.body.velocity)
 
 class Egg(Bird):
+    __slots__ = ('exploded', 'explode_frames')
+    STATE_ATTRS = Bird.STATE_ATTRS + ('exploded',)
+    IMAGE_ATTRS = Bird.IMAGE_ATTRS + ('explode_frames',)
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.EGG)
         self.exploded = False
@@ -289,9 +341,11 @@ class Egg(Bird):
             self.exploded = True
 
 class BigRedBird(Bird):
+    __slots__ = ('jump',)
+    STATE_ATTRS = Bird.STATE_ATTRS + ('jump',)
+
     def __init__(self, x, y):
         Bird.__init__(self, x, y, c.BIG_RED_BIRD)
-        self.mass = 8.0
         self.jump = True
 
     def load_images(self):
@@ -299,3 +353,7 @@ class BigRedBird(Bird):
         frame_rect_list = [(120, 638, 120, 120), (247, 638, 120, 120), (376, 639, 120, 120),
                            (501, 638, 120, 120)]
         self.frames = self.load_frames(sheet, frame_rect_list, c.BIRD_MULTIPLIER)
+
+# the bird class of each bird type
+BIRD_CLASSES = {c.RED_BIRD:RedBird, c.BLUE_BIRD:BlueBird, c.YELLOW_BIRD:YellowBird,
+                c.BLACK_BIRD:BlackBird, c.WHITE_BIRD:WhiteBird, c.BIG_RED_BIRD:BigRedBird}
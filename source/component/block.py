@@ -5,23 +5,12 @@ from .. import tool
 from .. import constants as c
 
 def create_block(x, y, material, shape, type, direction=0):
-    block = None
-    if material == c.GLASS:
-        if shape == c.BEAM:
-            block = BeamGlass(x, y, type, direction)
-        elif shape == c.CIRCLE:
-            block = CircleGlass(x, y, type)
-    elif material == c.WOOD:
-        if shape == c.BEAM:
-            block = BeamWood(x, y, type, direction)
-        elif shape == c.CIRCLE:
-            block = CircleWood(x, y, type)
-    elif material == c.STONE:
-        if shape == c.BEAM:
-            block = BeamStone(x, y, type, direction)
-        elif shape == c.CIRCLE:
-            block = CircleStone(x, y, type)
-    return block
+    block_class = BLOCK_CLASSES.get((material, shape))
+    if block_class is None:
+        return None
+    if shape == c.BEAM:
+        return block_class(x, y, type, direction)
+    return block_class(x, y, type)
 
 def get_block_mass(name, type):
     mass = base = 1.0
@@ -47,17 +36,25 @@ def get_block_mass(name, type):
     return mass
 
 class Block():
+    __slots__ = ('name', 'life', 'type', 'direction', 'mass', 'images', 'image_index',
+                 'image_num', 'image_threshold', 'image', 'orig_image', 'rect', 'phy')
+    # the values changed during the game, they are saved and loaded by the level snapshot
+    STATE_ATTRS = ('life', 'image_index', 'image', 'orig_image')
+    # (block class, type, direction): (images, image_threshold), which are shared
+    # by the blocks of the same kind
+    SHARED_IMAGES = {}
+
     def __init__(self, x, y, name, life):
         self.name = name
         self.life = life
 
-        self.load_images()
         self.setup_images()
         self.image = self.images[self.image_index]
         self.orig_image = self.image
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.bottom = y
+        self.phy = None
 
     def load_images(self):
         pass
@@ -68,17 +65,32 @@ class Block():
     def setup_images(self):
         '''image_threshold is used for change the image of the shape
            for 4 images of a shape, the values of image_threshold is [life, life//4 * 3, life//2, life//4]'''
+        key = (type(self), self.type, self.direction)
+        shared = Block.SHARED_IMAGES.get(key)
+        if shared is None:
+            self.load_images()
+            image_threshold = []
+            for i in reversed(range(len(self.images))):
+                i += 1
+                temp_life = self.life//len(self.images) * i
+                image_threshold.append(temp_life)
+            shared = Block.SHARED_IMAGES[key] = (self.images, tuple(image_threshold))
+        self.images, self.image_threshold = shared
         self.image_index = 0
         self.image_num = len(self.images)
-        self.image_threshold = []
-        for i in reversed(range(self.image_num)):
-            i += 1
-            temp_life = self.life//self.image_num * i
-            self.image_threshold.append(temp_life)
 
     def set_physics(self, phy):
         self.phy = phy
 
+    def save_state(self):
+        return (tuple(self.rect), [getattr(self, name) for name in self.STATE_ATTRS])
+
+    def load_state(self, state):
+        rect, values = state
+        self.rect = pg.Rect(rect)
+        for name, value in zip(self.STATE_ATTRS, values):
+            setattr(self, name, value)
+
     def update_position(self, x, y, image):
         self.rect.x = x
         self.rect.y = y
@@ -98,6 +110,8 @@ class Block():
         surface.blit(self.image, self.rect)
 
 class Beam(Block):
+    __slots__ = ()
+
     def __init__(self, x, y, life, direction):
         self.direction =  direction
         Block.__init__(self, x, y, c.BEAM, life)
@@ -112,6 +126,8 @@ class Beam(Block):
             self.images.append(image)
 
 class BeamGlass(Beam):
+    __slots__ = ()
+
     def __init__(self, x, y, type, direction):
         self.type = type
         Beam.__init__(self, x, y, 4, direction)
@@ -139,6 +155,8 @@ class BeamGlass(Beam):
         return rect_list
 
 class BeamWood(Beam):
+    __slots__ = ()
+
     def __init__(self, x, y, type, direction):
         self.type = type
         Beam.__init__(self, x, y, 12, direction)
@@ -166,6 +184,8 @@ class BeamWood(Beam):
         return rect_list
 
 class BeamStone(Beam):
+    __slots__ = ()
+
     def __init__(self, x, y, type, direction):
         self.type = type
         Beam.__init__(self, x, y, 48, direction)
@@ -193,7 +213,10 @@ class BeamStone(Beam):
         return rect_list
 
 class Circle(Block):
+    __slots__ = ()
+
     def __init__(self, x, y, life):
+        self.direction = c.HORIZONTAL
         Block.__init__(self, x, y, c.CIRCLE, life)
         self.mass = get_block_mass(self.name, self.type)
 
@@ -205,6 +228,8 @@ class Circle(Block):
             self.images.append(image)
 
 class CircleGlass(Circle):
+    __slots__ = ()
+
     def __init__(self, x, y, type):
         self.type = type
         Circle.__init__(self, x, y, 4)
@@ -220,6 +245,8 @@ class CircleGlass(Circle):
         return rect_list
 
 class CircleWood(Circle):
+    __slots__ = ()
+
     def __init__(self, x, y, type):
         self.type = type
         Circle.__init__(self, x, y, 12)
@@ -235,6 +262,8 @@ class CircleWood(Circle):
         return rect_list
 
 class CircleStone(Circle):
+    __slots__ = ()
+
     def __init__(self, x, y, type):
         self.type = type
         Circle.__init__(self, x, y, 48)
@@ -247,4 +276,9 @@ class CircleStone(Circle):
         elif self.type == c.BEAM_TYPE_2: # the big circle
             rect_list = [(252, 246, 73, 73), (252, 321, 73, 73),
                          (252, 396, 73, 73), (252, 471, 73, 73)]
-        return rect_list
\ No newline at end of file
+        return rect_list
+
+# the block class of each (material, shape), a beam takes a direction, a circle not
+BLOCK_CLASSES = {(c.GLASS, c.BEAM):BeamGlass, (c.GLASS, c.CIRCLE):CircleGlass,
+                 (c.WOOD, c.BEAM):BeamWood, (c.WOOD, c.CIRCLE):CircleWood,
+                 (c.STONE, c.BEAM):BeamStone, (c.STONE, c.CIRCLE):CircleStone}
@@ -1,10 +1,14 @@
 __author__ = 'marble_xu'
 
 import math
+import weakref
+import numpy as np
 import pygame as pg
 import pymunk as pm
 from pymunk import Vec2d
 from .. import tool
+from .. import telemetry
+from .. import profiler
 from .. import constants as c
 
 COLLISION_BIRD = 1
@@ -13,9 +17,14 @@ COLLISION_BLOCK = 3
 COLLISION_LINE = 4
 COLLISION_EXPLODE = 5
 COLLISION_EGG = 6
+# the shapes a fast body is stepped finely near
 
 BIRD_IMPULSE_TIMES = 3
 MIN_DAMAGE_IMPULSE = 300
+EXPLODE_RADIUS = 3 # the radius of an explosion piece
+GRAVITY = (0.0, -700.0)
+LAUNCH_POWER_TIMES = 53 # the launch impulse of a bird is sling distance * LAUNCH_POWER_TIMES
+REMOVAL_KEY = 'removal' # the key of the post step callback removing the entities
 
 def to_pygame(p):
     """Convert position of pymunk to position of pygame"""
@@ -25,28 +34,130 @@ def to_pymunk(x, y):
     """Convert position of pygame to position of pymunk"""
     return (x, -(y-600))
 
+def is_out_of_world(body):
+    '''return True if the center of the body is out of the world bounds of constants'''
+    x, y = body.position
+    return x < c.WORLD_LEFT or x > c.WORLD_RIGHT or y < 600 - c.WORLD_BOTTOM
+
+class EntitySet():
+    '''The entities in the order they are added, adding and removing an entity are
+       O(1) instead of the O(n) list.remove(). Concatenating with + gives a list'''
+    __slots__ = ('items',)
+
+    def __init__(self, items=()):
+        self.items = dict.fromkeys(items)
+
+    def add(self, item):
+        self.items[item] = None
+
+    def remove(self, item):
+        del self.items[item]
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __add__(self, other):
+        return list(self.items) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self.items)
+
 class Physics():
-    def __init__(self):
+    def __init__(self, clock=None, sleep_time_threshold=c.SLEEP_TIME_THRESHOLD,
+                 idle_speed_threshold=c.IDLE_SPEED_THRESHOLD, bulk_sync=c.BULK_SYNC,
+                 interpolate=False,
+                 query_explosion=c.QUERY_EXPLOSION):
+        '''clock is stepped with every physics step, the game time comes from it.
+           a body falls asleep after its speed keeps below idle_speed_threshold for
+           sleep_time_threshold seconds, set sleep_time_threshold to float('inf')
+           to disable sleeping.
+           if bulk_sync is True, the positions of the pigs and blocks are synced
+           from their bodies with numpy arrays instead of one by one.
+           if interpolate is True, the positions of the awake bodies before every
+           update are kept for interpolate_positions().
+           if query_explosion is True, explosions are applied by apply_explosion(),
+           otherwise they shoot explosion pieces'''
+        self.sleep_time_threshold = sleep_time_threshold
+        self.idle_speed_threshold = idle_speed_threshold
+        self.bulk_sync = bulk_sync
+        self.interpolate = interpolate
+        self.query_explosion = query_explosion
+        self.clock = clock if clock else tool.SimClock()
+        self.space = None
+        self.static_lines = None
         self.reset()
 
+    def __del__(self):
+        # the physics is freed by reference counting, while its bodies are alive
+        if self.space is not None:
+            self.teardown_space()
+
     def reset(self, level=None):
-        self.level = level
-        # init space: set gravity and dt
-        self.space = pm.Space()
-        self.space.gravity = (0.0, -700.0)
+        self.set_level(level)
+        self.setup_space()
         self.dt = 0.002
-        self.birds = []
-        self.pigs = []
-        self.blocks = []
-        self.explodes = []
-        self.eggs = []
+        # setting the velocity of a body wakes it up, so the bodies moving slower than
+        # this speed are not slowed down by the ground, or they never fall asleep
+        self.idle_speed = self.idle_speed_threshold or self.space.gravity.length * self.dt
+        self.birds = EntitySet()
+        self.pigs = EntitySet()
+        self.blocks = EntitySet()
+        self.explodes = EntitySet()
+        self.eggs = EntitySet()
+        # entity: (entity set, score) of the entities removed at the end of the step
+        self.removals = {}
+        # map the shape to the bird, pig, block or egg it belongs to, which is used
+        # in the collision handlers to find the entity without scanning the lists
+        self.shape_to_entity = {}
         self.path_timer = 0
         self.check_collide = False
         self.explode_timer = 0
+        # (entity, position, angle, is block) of the awake bodies before the last update
+        self.previous_states = []
+
+    def set_level(self, level):
+        '''the level is referred weakly, so the level and its physics are not in a
+           reference cycle and are freed without the garbage collector, which may free
+           the bodies before the space, see teardown_space()'''
+        self.level = weakref.proxy(level) if level is not None else None
+
+    def setup_space(self):
+        if self.space is not None:
+            self.teardown_space()
+        # init space: set gravity and dt
+        self.space = pm.Space()
+        self.space.gravity = GRAVITY
+        # sleeping bodies are not integrated and collided by pymunk, and
+        # their positions are not synced to the sprites in update()
+        self.space.sleep_time_threshold = self.sleep_time_threshold
+        self.space.idle_speed_threshold = self.idle_speed_threshold
         self.setup_lines()
         self.setup_collision_handler()
 
+    def teardown_space(self):
+        '''Remove all the shapes and bodies from the space before it is dropped.
+           pymunk keeps a space in a reference cycle with its collision handlers, so
+           it is freed by the garbage collector, which frees the objects of a cycle in
+           any order, and freeing a space wakes up its sleeping bodies, which crashes
+           if they are freed before'''
+        space = self.space
+        space.remove(*space.shapes)
+        space.remove(*space.bodies)
+        self.space = None
+
     def setup_lines(self):
+        # the ground never changes, it is built once and added to every new space
+        if self.static_lines is None:
+            self.static_lines = self.create_lines()
+        self.space.add(self.static_lines)
+
+    def create_lines(self):
         # Static Ground
         x, y = to_pymunk(c.SCREEN_WIDTH, c.GROUND_HEIGHT)
         static_body = pm.Body(body_type=pm.Body.STATIC)
@@ -56,72 +167,77 @@ class Physics():
             line.elasticity = 0.95
             line.friction = 1
             line.collision_type = COLLISION_LINE
-        self.space.add(static_lines)
-        self.static_lines = static_lines
+        return static_lines
 
     def setup_collision_handler(self):
+        # the handlers are kept by the space, they refer to self weakly, so self
+        # and its space are not in a reference cycle
+        physics = weakref.proxy(self)
         def post_solve_bird_line(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 bird_shape = arbiter.shapes[0]
-                my_phy.handle_bird_collide(bird_shape, True)
+                physics.handle_bird_collide(bird_shape, True)
         def post_solve_pig_bird(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 pig_shape = arbiter.shapes[0]
-                my_phy.handle_pig_collide(pig_shape, arbiter.total_impulse.length * BIRD_IMPULSE_TIMES)
+                physics.handle_pig_collide(pig_shape, arbiter.total_impulse.length * BIRD_IMPULSE_TIMES)
         def post_solve_pig_line(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 pig_shape = arbiter.shapes[0]
-                my_phy.handle_pig_collide(pig_shape, arbiter.total_impulse.length, True)
+                physics.handle_pig_collide(pig_shape, arbiter.total_impulse.length, True)
         def post_solve_pig_block(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 if arbiter.total_impulse.length >= MIN_DAMAGE_IMPULSE:
                     pig_shape = arbiter.shapes[0]
-                    my_phy.handle_pig_collide(pig_shape, arbiter.total_impulse.length)
+                    physics.handle_pig_collide(pig_shape, arbiter.total_impulse.length)
         def post_solve_block_bird(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 block_shape, bird_shape = arbiter.shapes
-                my_phy.handle_bird_collide(bird_shape)
+                physics.handle_bird_collide(bird_shape)
                 if arbiter.total_impulse.length >= MIN_DAMAGE_IMPULSE:
-                    my_phy.handle_block_collide(block_shape, arbiter.total_impulse.length)
+                    physics.handle_block_collide(block_shape, arbiter.total_impulse.length)
 
         def post_solve_block_explode(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 block_shape = arbiter.shapes[0]
                 if arbiter.total_impulse.length > MIN_DAMAGE_IMPULSE:
-                    my_phy.handle_block_collide(block_shape, arbiter.total_impulse.length)
+                    physics.handle_block_collide(block_shape, arbiter.total_impulse.length)
 
         def post_solve_pig_explode(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 pig_shape = arbiter.shapes[0]
                 if arbiter.total_impulse.length > MIN_DAMAGE_IMPULSE:
-                    my_phy.handle_pig_collide(pig_shape, arbiter.total_impulse.length)
+                    physics.handle_pig_collide(pig_shape, arbiter.total_impulse.length)
 
         def post_solve_egg(arbiter, space, data):
-            if self.check_collide:
+            if physics.check_collide:
                 egg_shape = arbiter.shapes[0]
-                my_phy.handle_egg_collide(egg_shape)
+                physics.handle_egg_collide(egg_shape)
 
+        # the callbacks are timed only if the profiler is started before the reset
+        timed = lambda callback: profiler.wrap(profiler.COLLISION, callback)
         self.space.add_collision_handler(
-            COLLISION_BIRD, COLLISION_LINE).post_solve = post_solve_bird_line
+            COLLISION_BIRD, COLLISION_LINE).post_solve = timed(post_solve_bird_line)
 
         self.space.add_collision_handler(
-            COLLISION_PIG, COLLISION_BIRD).post_solve = post_solve_pig_bird
+            COLLISION_PIG, COLLISION_BIRD).post_solve = timed(post_solve_pig_bird)
 
         self.space.add_collision_handler(
-            COLLISION_PIG, COLLISION_LINE).post_solve = post_solve_pig_line
+            COLLISION_PIG, COLLISION_LINE).post_solve = timed(post_solve_pig_line)
 
         self.space.add_collision_handler(
-            COLLISION_PIG, COLLISION_BLOCK).post_solve = post_solve_pig_block
+            COLLISION_PIG, COLLISION_BLOCK).post_solve = timed(post_solve_pig_block)
 
         self.space.add_collision_handler(
-            COLLISION_BLOCK, COLLISION_BIRD).post_solve = post_solve_block_bird
+            COLLISION_BLOCK, COLLISION_BIRD).post_solve = timed(post_solve_block_bird)
 
         self.space.add_collision_handler(
-            COLLISION_BLOCK, COLLISION_EXPLODE).post_solve = post_solve_block_explode
+            COLLISION_BLOCK, COLLISION_EXPLODE).post_solve = timed(post_solve_block_explode)
 
         self.space.add_collision_handler(
-            COLLISION_PIG, COLLISION_EXPLODE).post_solve = post_solve_pig_explode
+            COLLISION_PIG, COLLISION_EXPLODE).post_solve = timed(post_solve_pig_explode)
 
+        post_solve_egg = timed(post_solve_egg)
         self.space.add_collision_handler(
             COLLISION_EGG, COLLISION_LINE).post_solve = post_solve_egg
         self.space.add_collision_handler(
@@ -137,26 +253,30 @@ class Physics():
         radius = bird.get_radius()
         phybird = PhyBird(distance, angle, x, y, self.space, bird.get_radius(), bird.mass)
         bird.set_physics(phybird)
-        self.birds.append(bird)
+        self.birds.add(bird)
+        self.shape_to_entity[phybird.shape] = bird
 
     def add_egg(self, egg):
         x, y = to_pymunk(egg.rect.centerx, egg.rect.centery)
         phy = PhyEgg((x, y), egg.rect.w, egg.rect.h, self.space, 10)
         egg.set_physics(phy)
-        self.eggs.append(egg)
+        self.eggs.add(egg)
+        self.shape_to_entity[phy.shape] = egg
 
     def add_bird_by_copy(self, bird, body):
         phybird = PhyBird2(body, self.space)
         bird.set_physics(phybird)
-        self.birds.append(bird)
-        
+        self.birds.add(bird)
+        self.shape_to_entity[phybird.shape] = bird
+
     def add_pig(self, pig):
         '''must use the center position of pygame to transfer to the position of pymunk'''
         x, y = to_pymunk(pig.rect.centerx, pig.rect.centery)
         radius = pig.rect.w//2
         phypig = PhyPig(x, y, radius, self.space)
         pig.set_physics(phypig)
-        self.pigs.append(pig)
+        self.pigs.add(pig)
+        self.shape_to_entity[phypig.shape] = pig
 
     def add_block(self, block):
         '''must use the center position of pygame to transfer to the position of pymunk'''
@@ -170,17 +290,55 @@ class Physics():
             phy = PhyCircle((x, y), radius, self.space, block.mass)
         if phy:
             block.set_physics(phy)
-            self.blocks.append(block)
+            self.blocks.add(block)
+            self.shape_to_entity[phy.shape] = block
         else:
             print('not support block type:', block.name)
 
+    def remove_later(self, entity, entities, score=0):
+        '''Remove the entity from the space and from the entity set entities at the end
+           of the current physics step, together with all the other entities removed
+           in the step, score is added to the level when it is removed.
+           Outside a step, remove_pending() removes it'''
+        if entity not in self.removals:
+            self.removals[entity] = (entities, score)
+            self.space.add_post_step_callback(remove_pending, REMOVAL_KEY, weakref.proxy(self))
+
+    def remove_pending(self):
+        '''remove the entities waiting for removal with one space.remove() call'''
+        if not self.removals:
+            return
+        removals, self.removals = self.removals, {}
+        objects = []
+        for entity, (entities, score) in removals.items():
+            entities.remove(entity)
+            # the explodes are the physics objects without entity
+            phy = entity if entities is self.explodes else entity.phy
+            objects.append(phy.shape)
+            objects.append(phy.body)
+            self.shape_to_entity.pop(phy.shape, None)
+            if entities is self.birds:
+                entity.set_dead()
+            if score:
+                if telemetry.RECORDER:
+                    telemetry.RECORDER.record(telemetry.KILL, self.current_time, entity.name,
+                                              *entity.rect.center)
+                if self.level:
+                    self.level.update_score(score)
+        self.space.remove(*objects)
+
     def add_explode(self, pos, angle, length, mass):
         phyexplode = PhyExplode(pos, angle, length, self.space, mass)
-        self.explodes.append(phyexplode)
+        self.explodes.add(phyexplode)
 
     def create_explosion(self, pos, radius, length, mass):
         ''' parameter pos is the pymunk position'''
+        if telemetry.RECORDER:
+            telemetry.RECORDER.record(telemetry.EXPLOSION, self.current_time, pos[0], pos[1], radius)
         explode_num = 12
+        if self.query_explosion:
+            self.apply_explosion(pos, radius, length, mass, explode_num)
+            return
         sub_pi = math.pi * 2 / explode_num
         for i in range(explode_num):
             angle = sub_pi * i
@@ -189,8 +347,42 @@ class Physics():
             # angle value must calculated by math.pi * 2
             self.add_explode((x,y), angle, length, mass)
 
+    def apply_explosion(self, pos, radius, length, mass, explode_num):
+        '''Push and damage the pigs and blocks the explosion pieces would hit with a
+           segment query per piece, no body is added. A piece flies from the pymunk
+           position pos to radius + length away until it hits the ground. It hits
+           every pig and block on its way and slows down by each like an inelastic
+           collision, a body of mass m hit at speed scale s is pushed by
+           s * mass * m / (mass + m) * c.EXPLOSION_PUSH and damaged like an explosion
+           piece hitting it by that reduced mass * c.EXPLOSION_DAMAGE'''
+        pos = Vec2d(pos)
+        sub_pi = math.pi * 2 / explode_num
+        for i in range(explode_num):
+            angle = sub_pi * i
+            direction = Vec2d(math.sin(angle), math.cos(angle))
+            end = pos + direction * (radius + length)
+            hits = sorted(self.space.segment_query(pos, end, EXPLODE_RADIUS, pm.ShapeFilter()),
+                          key=lambda info: info.alpha)
+            scale = 1
+            for hit in hits:
+                shape = hit.shape
+                if shape.collision_type == COLLISION_LINE:
+                    break
+                entity = self.shape_to_entity.get(shape)
+                if entity in self.pigs:
+                    handle_collide = self.handle_pig_collide
+                elif entity in self.blocks:
+                    handle_collide = self.handle_block_collide
+                else:
+                    continue
+                body = shape.body
+                reduced_mass = mass * body.mass / (mass + body.mass)
+                body.apply_impulse_at_world_point(
+                    direction * scale * reduced_mass * c.EXPLOSION_PUSH, hit.point)
+                handle_collide(shape, scale * reduced_mass * c.EXPLOSION_DAMAGE)
+                scale *= mass / (mass + body.mass)
+
     def check_explosion(self):
-        explodes_to_remove = []
         if len(self.explodes) == 0:
             return
 
@@ -198,36 +390,39 @@ class Physics():
             self.explode_timer = self.current_time
         elif (self.current_time - self.explode_timer) > 1000:
             for explode in self.explodes:
-                self.space.remove(explode.shape, explode.shape.body)
-                self.explodes.remove(explode)
-                self.explode_timer = 0
+                self.remove_later(explode, self.explodes)
+            self.explode_timer = 0
 
         for explode in self.explodes:
-            if explode.is_out_of_length():
-                explodes_to_remove.append(explode)
-
-        for explode in explodes_to_remove:
-            self.space.remove(explode.shape, explode.shape.body)
-            self.explodes.remove(explode)
+            if explode.is_out_of_length() or is_out_of_world(explode.body):
+                self.remove_later(explode, self.explodes)
+        self.remove_pending()
 
     def update(self, game_info, level, mouse_pressed):
-        birds_to_remove = []
-        pigs_to_remove = []
-        blocks_to_remove = []
-        eggs_to_remove = []
         self.current_time = game_info[c.CURRENT_TIME]
+        if self.interpolate:
+            self.save_previous_states()
 
         #From pymunk doc:Performing multiple calls with a smaller dt
         #                creates a more stable and accurate simulation
-        #So make five updates per frame for better stability
-        for x in range(5):
+        #So make several updates per frame for better stability
+        prof = profiler.PROFILER
+        for x in range(c.SUBSTEPS):
+            start = prof.start() if prof else 0
             self.space.step(self.dt)
+            if prof:
+                prof.add(profiler.STEP, start)
+            self.clock.step(self.dt)
+        start = prof.start() if prof else 0
 
-        for bird in self.birds:
+        birds = list(self.birds)
+        for bird in birds:
             bird.update(game_info, level, mouse_pressed)
-            if (bird.phy.shape.body.position.y < 0 or bird.state == c.DEAD
-                or bird.phy.shape.body.position.x > c.SCREEN_WIDTH * 2):
-                birds_to_remove.append(bird)
+            # the birds split from a blue bird are added in update(), update them in this loop too
+            if len(self.birds) > len(birds):
+                birds.extend(list(self.birds)[len(birds):])
+            if bird.state == c.DEAD or is_out_of_world(bird.phy.body):
+                self.remove_later(bird, self.birds)
             else:
                 poly = bird.phy.shape
                 # the postion transferred from pymunk is the center position of pygame
@@ -241,50 +436,36 @@ class Physics():
                 bird.update_position(x, y, angle_degree)
                 self.update_bird_path(bird, p, level)
 
-        for bird in birds_to_remove:
-            self.space.remove(bird.phy.shape, bird.phy.shape.body)
-            self.birds.remove(bird)
-            bird.set_dead()
-
+        # the pigs and blocks killed in the collision handlers are already removed at
+        # the end of the steps, the awake ones out of the world are removed here
+        pigs_to_sync = []
         for pig in self.pigs:
             pig.update(game_info)
-            if pig.phy.body.position.y < 0 or pig.life <= 0:
-                pigs_to_remove.append(pig)
-            poly = pig.phy.shape
-            p = to_pygame(poly.body.position)
-            x, y = p
-            w, h = pig.image.get_size()
-            x -= w * 0.5
-            y -= h * 0.5
-            angle_degree = math.degrees(poly.body.angle)
-            pig.update_position(x, y, angle_degree)
-
-        for pig in pigs_to_remove:
-            self.space.remove(pig.phy.shape, pig.phy.shape.body)
-            self.pigs.remove(pig)
-            level.update_score(c.PIG_SCORE)
+            if pig.phy.body.is_sleeping:
+                continue
+            if pig.life <= 0 or is_out_of_world(pig.phy.body):
+                self.remove_later(pig, self.pigs, c.PIG_SCORE)
+            else:
+                pigs_to_sync.append(pig)
 
+        blocks_to_sync = []
         for block in self.blocks:
-            if block.life <= 0:
-                blocks_to_remove.append(block)
-            poly = block.phy.shape
-            p = poly.body.position
-            p = Vec2d(to_pygame(p))
-            angle_degree = math.degrees(poly.body.angle) + 180
-            rotated_image = pg.transform.rotate(block.orig_image, angle_degree)
-            offset = Vec2d(rotated_image.get_size()) / 2.
-            p = p - offset
-            block.update_position(p.x, p.y, rotated_image)
+            if block.phy.body.is_sleeping:
+                continue
+            if is_out_of_world(block.phy.body):
+                self.remove_later(block, self.blocks)
+            else:
+                blocks_to_sync.append(block)
 
-        for block in blocks_to_remove:
-            self.space.remove(block.phy.shape, block.phy.shape.body)
-            self.blocks.remove(block)
-            level.update_score(c.SHAPE_SCORE)
+        if self.bulk_sync:
+            self.sync_bulk(pigs_to_sync, blocks_to_sync)
+        else:
+            self.sync_each(pigs_to_sync, blocks_to_sync)
 
         for egg in self.eggs:
             egg.update(game_info, level, mouse_pressed)
-            if egg.state == c.DEAD:
-                eggs_to_remove.append(egg)
+            if egg.state == c.DEAD or is_out_of_world(egg.phy.body):
+                self.remove_later(egg, self.eggs)
             poly = egg.phy.shape
             p = to_pygame(poly.body.position)
             x, y = p
@@ -295,11 +476,187 @@ class Physics():
             angle_degree = math.degrees(poly.body.angle)
             egg.update_position(x, y, angle_degree)
 
-        for egg in eggs_to_remove:
-            self.space.remove(egg.phy.shape, egg.phy.shape.body)
-            self.eggs.remove(egg)
+        self.remove_pending()
 
+        if prof:
+            start = prof.add(profiler.SYNC, start)
         self.check_explosion()
+        if prof:
+            prof.add(profiler.EXPLOSION, start)
+
+    def save_previous_states(self):
+        states = []
+        for items, is_block in ((self.birds, False), (self.pigs, False),
+                                (self.blocks, True), (self.eggs, False)):
+            for item in items:
+                body = item.phy.body
+                if not body.is_sleeping:
+                    states.append((item, body.position, body.angle, is_block))
+        self.previous_states = states
+
+    def interpolate_positions(self, alpha):
+        '''Move the sprites of the bodies to alpha (0 to 1) of the way from their positions
+           before the last update to the current positions, which is used to draw a
+           frame between two updates. The sprites are moved in the same way as update(),
+           return the saved positions for restore_positions(), which must be called
+           before the next update, so the game logic never sees the moved sprites'''
+        saved = []
+        for item, position, angle, is_block in self.previous_states:
+            body = item.phy.body
+            x, y = to_pygame(position.interpolate_to(body.position, alpha))
+            angle_degree = math.degrees(angle + (body.angle - angle) * alpha)
+            if is_block:
+                saved.append((item, item.rect.x, item.rect.y, item.image))
+                image = tool.rotate_image(item.orig_image, angle_degree + 180)
+                w, h = image.get_size()
+                item.update_position(x - w * 0.5, y - h * 0.5, image)
+            else:
+                saved.append((item, item.rect.x, item.rect.y, item.angle_degree))
+                w, h = item.image.get_size()
+                item.update_position(x - w * 0.5, y - h * 0.5, angle_degree)
+        return saved
+
+    def restore_positions(self, saved):
+        for item, x, y, value in saved:
+            item.update_position(x, y, value)
+
+    def sync_each(self, pigs, blocks):
+        '''sync the positions of the pigs and blocks from their bodies one by one'''
+        for pig in pigs:
+            poly = pig.phy.shape
+            p = to_pygame(poly.body.position)
+            x, y = p
+            w, h = pig.image.get_size()
+            x -= w * 0.5
+            y -= h * 0.5
+            angle_degree = math.degrees(poly.body.angle)
+            pig.update_position(x, y, angle_degree)
+
+        for block in blocks:
+            poly = block.phy.shape
+            p = poly.body.position
+            p = Vec2d(to_pygame(p))
+            angle_degree = math.degrees(poly.body.angle) + 180
+            rotated_image = tool.rotate_image(block.orig_image, angle_degree)
+            offset = Vec2d(rotated_image.get_size()) / 2.
+            p = p - offset
+            block.update_position(p.x, p.y, rotated_image)
+
+    def sync_bulk(self, pigs, blocks):
+        '''sync the positions of the pigs and blocks from their bodies, the positions and
+           angles of all the bodies are gathered into one array, converted to pygame
+           positions together and scattered back, the result is the same as sync_each'''
+        pig_num = len(pigs)
+        num = pig_num + len(blocks)
+        if num == 0:
+            return
+        values = []
+        for item in pigs + blocks:
+            body = item.phy.body
+            values.extend(body.position)
+            values.append(body.angle)
+        states = np.array(values).reshape(num, 3)
+        # same as to_pygame
+        centers = np.trunc(np.stack((states[:, 0], 600 - states[:, 1]), axis=1))
+        degrees = np.degrees(states[:, 2])
+        degrees[pig_num:] += 180
+
+        block_degrees = degrees[pig_num:].tolist()
+        images = [tool.rotate_image(block.orig_image, angle_degree)
+                  for block, angle_degree in zip(blocks, block_degrees)]
+        sizes = np.array([pig.image.get_size() for pig in pigs] +
+                         [image.get_size() for image in images], dtype=float).reshape(num, 2)
+        # change to [left, top] position of pygame
+        positions = (centers - sizes * 0.5).tolist()
+
+        for pig, (x, y), angle_degree in zip(pigs, positions, degrees.tolist()):
+            pig.update_position(x, y, angle_degree)
+        for block, (x, y), image in zip(blocks, positions[pig_num:], images):
+            block.update_position(x, y, image)
+
+    def snapshot(self):
+        '''return the state of the entities and their bodies, with the sleeping groups.
+           restore() writes the state back to the same bodies and adds them to a new
+           space, so restoring a snapshot twice runs the same. A snapshot is invalid
+           after reset()'''
+        entities = self.birds + self.pigs + self.blocks + self.eggs
+        phys = [item.phy for item in entities] + self.explodes
+        sleep_groups = self.get_sleep_groups([phy.body for phy in phys])
+        bodies = []
+        for phy, sleep_group in zip(phys, sleep_groups):
+            body = phy.body
+            bodies.append((phy, body.position, body.velocity, body.angle,
+                           body.angular_velocity, sleep_group))
+        return (list(self.birds), list(self.pigs), list(self.blocks), list(self.eggs),
+                list(self.explodes), bodies, [item.save_state() for item in entities],
+                self.check_collide, self.explode_timer)
+
+    def restore(self, snapshot):
+        (birds, pigs, blocks, eggs, explodes, bodies, entity_states,
+         self.check_collide, self.explode_timer) = snapshot
+        # the bodies are added in the saved order to a new space. A used space keeps
+        # the contacts and the grown tables of its last run, which change the order
+        # the contacts are solved in, so a restored level would not run the same
+        self.setup_space()
+        objects = []
+        for phy, position, velocity, angle, angular_velocity, sleep_group in bodies:
+            body = phy.body
+            # moving the body by 0 clears the bias velocity left by the last solver
+            # step, which pymunk can't set
+            pm.Body.update_position(body, 0)
+            body.position = position
+            body.velocity = velocity
+            body.angle = angle
+            body.angular_velocity = angular_velocity
+            objects.append(body)
+            objects.append(phy.shape)
+        self.space.add(*objects)
+        # the bodies sleeping at the snapshot sleep again, in the same groups
+        for i, (phy, *state, sleep_group) in enumerate(bodies):
+            if sleep_group == i:
+                phy.body.sleep()
+            elif sleep_group is not None:
+                phy.body.sleep_with_group(bodies[sleep_group][0].body)
+
+        self.birds, self.pigs, self.blocks = EntitySet(birds), EntitySet(pigs), EntitySet(blocks)
+        self.eggs, self.explodes = EntitySet(eggs), EntitySet(explodes)
+        self.removals = {}
+        entities = self.birds + self.pigs + self.blocks + self.eggs
+        for item, state in zip(entities, entity_states):
+            item.load_state(state)
+        self.shape_to_entity = {item.phy.shape:item for item in entities}
+
+    def get_sleep_groups(self, bodies):
+        '''return the index in bodies of the first body of the sleeping group of every
+           body, None for an awake body. The sleeping bodies touching each other are in
+           one group, which wakes up together'''
+        indexes = {body:i for i, body in enumerate(bodies)}
+        groups = [None] * len(bodies)
+        for i, body in enumerate(bodies):
+            if groups[i] is not None or not body.is_sleeping:
+                continue
+            groups[i] = i
+            stack = [body]
+            while stack:
+                touching = []
+                stack.pop().each_arbiter(lambda arbiter: touching.extend(
+                                         shape.body for shape in arbiter.shapes))
+                for other in touching:
+                    j = indexes.get(other)
+                    if j is not None and groups[j] is None and other.is_sleeping:
+                        groups[j] = i
+                        stack.append(other)
+        return groups
+
+    def is_at_rest(self):
+        '''return True if there is no bird, egg or explosion in the space and all the
+           pigs and blocks are sleeping'''
+        if self.birds or self.eggs or self.explodes:
+            return False
+        for item in self.pigs + self.blocks:
+            if not item.phy.body.is_sleeping:
+                return False
+        return True
 
     def update_bird_path(self, bird, pos, level):
         if bird.path_timer == 0:
@@ -310,38 +667,53 @@ class Physics():
                 level.bird_path.append(pos)
 
     def handle_bird_collide(self, bird_shape, is_ground=False):
-        for bird in self.birds:
-            if bird_shape == bird.phy.shape:
-                if is_ground: # change the velocity of bird to 50% of the original value
-                    if not (bird.name == c.BIG_RED_BIRD and bird.jump):
-                        bird.phy.body.velocity = bird.phy.body.velocity * 0.5
-                elif bird.name == c.BIG_RED_BIRD:
-                    bird.jump = False
-                bird.set_collide()
+        bird = self.shape_to_entity.get(bird_shape)
+        if bird is None:
+            return
+        if is_ground: # change the velocity of bird to 50% of the original value
+            if not (bird.name == c.BIG_RED_BIRD and bird.jump):
+                bird.phy.body.velocity = bird.phy.body.velocity * 0.5
+        elif bird.name == c.BIG_RED_BIRD:
+            bird.jump = False
+        bird.set_collide()
 
     def handle_pig_collide(self, pig_shape, impulse, is_ground=False):
-        for pig in self.pigs:
-            if pig_shape == pig.phy.shape:
-                if is_ground:
-                    pig.phy.body.velocity = pig.phy.body.velocity * 0.8
-                else:
-                    damage = impulse // MIN_DAMAGE_IMPULSE
-                    pig.set_damage(damage)
-                    print('pig life:', pig.life, ' damage:', damage, ' impulse:', impulse)
+        pig = self.shape_to_entity.get(pig_shape)
+        if pig is None:
+            return
+        if is_ground:
+            if pig.phy.body.velocity.length > self.idle_speed:
+                pig.phy.body.velocity = pig.phy.body.velocity * 0.8
+        else:
+            damage = impulse // MIN_DAMAGE_IMPULSE
+            pig.set_damage(damage)
+            # wake up the body, so the hurt image is synced in update()
+            pig.phy.body.activate()
+            if telemetry.RECORDER:
+                telemetry.RECORDER.record(telemetry.DAMAGE, self.current_time, pig.name,
+                                          damage, impulse, pig.life)
+            if pig.life <= 0:
+                self.remove_later(pig, self.pigs, c.PIG_SCORE)
 
     def handle_block_collide(self, block_shape, impulse):
-        for block in self.blocks:
-            if block_shape == block.phy.shape:
-                damage = impulse // MIN_DAMAGE_IMPULSE
-                block.set_damage(damage)
-                print('block damage:', damage, ' impulse:', impulse, ' life:', block.life)
+        block = self.shape_to_entity.get(block_shape)
+        if block is None:
+            return
+        damage = impulse // MIN_DAMAGE_IMPULSE
+        block.set_damage(damage)
+        block.phy.body.activate()
+        if telemetry.RECORDER:
+            telemetry.RECORDER.record(telemetry.DAMAGE, self.current_time, block.name,
+                                      damage, impulse, block.life)
+        if block.life <= 0:
+            self.remove_later(block, self.blocks, c.SHAPE_SCORE)
 
     def handle_egg_collide(self, egg_shape):
-        for egg in self.eggs:
-            if egg_shape == egg.phy.shape:
-                egg.set_explode()
-                egg.phy.body.velocity = egg.phy.body.velocity * 0.01
-                break
+        egg = self.shape_to_entity.get(egg_shape)
+        if egg is None:
+            return
+        egg.set_explode()
+        egg.phy.body.velocity = egg.phy.body.velocity * 0.01
 
     def draw(self, surface):
         # Draw static lines
@@ -371,13 +743,19 @@ class Physics():
                 pos = to_pygame(explode.body.position)
                 pg.draw.circle(surface, c.RED, pos, 5)
 
+def remove_pending(space, key, physics):
+    '''the post step callback of remove_later(), physics is a weak proxy'''
+    physics.remove_pending()
+
 class PhyBird():
+    __slots__ = ('life', 'body', 'shape')
+
     def __init__(self, distance, angle, x, y, space, radius, mass):
         self.life = 10
         inertia = pm.moment_for_circle(mass, 0, radius, (0, 0))
         body = pm.Body(mass, inertia)
         body.position = x, y
-        power = distance * 53
+        power = distance * LAUNCH_POWER_TIMES
         impulse = power * Vec2d(1, 0)
         angle = -angle
         body.apply_impulse_at_local_point(impulse.rotated(angle))
@@ -394,6 +772,8 @@ class PhyBird():
         return to_pygame(self.body.position)
 
 class PhyBird2():
+    __slots__ = ('life', 'body', 'shape')
+
     def __init__(self, body, space):
         self.life = 10
         radius = 12
@@ -407,6 +787,8 @@ class PhyBird2():
 
 
 class PhyPig():
+    __slots__ = ('body', 'shape')
+
     def __init__(self, x, y, radius, space):
         mass = 5
         inertia = pm.moment_for_circle(mass, 0, radius, (0, 0))
@@ -421,6 +803,8 @@ class PhyPig():
         self.shape = shape
 
 class PhyPolygon():
+    __slots__ = ('body', 'shape')
+
     def __init__(self, pos, length, height, space, mass=5.0):
         moment = 1000
         body = pm.Body(mass, moment)
@@ -433,6 +817,8 @@ class PhyPolygon():
         self.shape = shape
 
 class PhyCircle():
+    __slots__ = ('body', 'shape')
+
     def __init__(self, pos, radius, space, mass=5.0):
         moment = 1000
         body = pm.Body(mass, moment)
@@ -445,9 +831,11 @@ class PhyCircle():
         self.shape = shape
 
 class PhyExplode():
+    __slots__ = ('body', 'shape', 'orig_pos', 'length')
+
     def __init__(self, pos, angle, length, space, mass=5.0):
         ''' parater angle is clockwise value '''
-        radius = 3
+        radius = EXPLODE_RADIUS
         moment = 1000
         body = pm.Body(mass, moment)
         body.position = Vec2d(pos)
@@ -475,6 +863,8 @@ class PhyExplode():
         return False
 
 class PhyEgg():
+    __slots__ = ('body', 'shape')
+
     def __init__(self, pos, length, height, space, mass=5.0):
         moment = 1000
         body = pm.Body(mass, moment)
@@ -490,6 +880,3 @@ class PhyEgg():
         space.add(body, shape)
         self.body = body
         self.shape = shape
-
-# must init as a global parameter to use in the post_solve handler
-my_phy = Physics()
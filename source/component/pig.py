@@ -6,21 +6,27 @@ from .. import tool
 from .. import constants as c
 
 def create_pig(type, x, y):
-    pig = None
-    if type == c.NORMAL_PIG:
-        pig = NormalPig(x, y)
-    elif type == c.BIG_PIG:
-        pig = BigPig(x, y)
-    return pig
+    pig_class = PIG_CLASSES.get(type)
+    if pig_class is None:
+        return None
+    return pig_class(x, y)
 
 class Pig():
+    __slots__ = ('name', 'life', 'animate_timer', 'images_list', 'image_index', 'image_num',
+                 'image_threshold', 'frames', 'frame_index', 'frame_num', 'image', 'rect',
+                 'angle_degree', 'state', 'phy', 'current_time')
+    # the values changed during the game, they are saved and loaded by the level snapshot
+    STATE_ATTRS = ('life', 'animate_timer', 'image_index', 'frames', 'frame_index',
+                   'frame_num', 'image', 'angle_degree', 'state')
+    # pig name: (images_list, image_threshold), which are shared by the pigs of the same type
+    SHARED_IMAGES = {}
+    animate_interval = 100
+
     def __init__(self, x, y, name, life):
         self.name = name
         self.life = life
         self.animate_timer = 0
-        self.animate_interval = 100
 
-        self.load_images()
         self.setup_images()
         self.frame_index = 0
         self.frame_num = len(self.frames)
@@ -30,6 +36,7 @@ class Pig():
         self.rect.bottom = y
         self.angle_degree = 0
         self.state = c.IDLE
+        self.phy = None
 
     def load_frames(self, sheet, frame_rect_list, scale):
         frames = []
@@ -44,15 +51,19 @@ class Pig():
     def setup_images(self):
         ''' a image is mapping to a frame list
             normalpig has 3 images: normal image, hurt1 image and hurt2 image '''
+        shared = Pig.SHARED_IMAGES.get(self.name)
+        if shared is None:
+            self.load_images()
+            image_threshold = []
+            for i in reversed(range(len(self.images_list))):
+                i += 1
+                temp_life = self.life//len(self.images_list) * i
+                image_threshold.append(temp_life)
+            shared = Pig.SHARED_IMAGES[self.name] = (self.images_list, tuple(image_threshold))
+        self.images_list, self.image_threshold = shared
         self.image_index = 0
         self.image_num = len(self.images_list)
         self.frames = self.images_list[self.image_index]
-
-        self.image_threshold = []
-        for i in reversed(range(self.image_num)):
-            i += 1
-            temp_life = self.life//self.image_num * i
-            self.image_threshold.append(temp_life)
         
     def update(self, game_info):
         self.current_time = game_info[c.CURRENT_TIME]
@@ -71,11 +82,20 @@ class Pig():
             self.animate_timer = self.current_time
 
         image = self.frames[self.frame_index]
-        self.image = pg.transform.rotate(image, self.angle_degree)
+        self.image = tool.rotate_image(image, self.angle_degree)
 
     def set_physics(self, phy):
         self.phy = phy
 
+    def save_state(self):
+        return (tuple(self.rect), [getattr(self, name) for name in self.STATE_ATTRS])
+
+    def load_state(self, state):
+        rect, values = state
+        self.rect = pg.Rect(rect)
+        for name, value in zip(self.STATE_ATTRS, values):
+            setattr(self, name, value)
+
     def set_dead(self):
         self.state = c.DEAD
 
@@ -101,6 +121,8 @@ class Pig():
         surface.blit(self.image, self.rect)
 
 class NormalPig(Pig):
+    __slots__ = ()
+
     def __init__(self, x, y):
         Pig.__init__(self, x, y, c.NORMAL_PIG, 12)
 
@@ -116,6 +138,8 @@ class NormalPig(Pig):
             self.images_list.append(self.load_frames(sheet, rect_list, c.NORMAL_PIG_MULTIPLIER))
 
 class BigPig(Pig):
+    __slots__ = ()
+
     def __init__(self, x, y):
         Pig.__init__(self, x, y, c.BIG_PIG, 16)
 
@@ -128,4 +152,7 @@ class BigPig(Pig):
 
         rect_lists = [normal_rect_list, hurt1_rect_list, hurt2_rect_list]
         for rect_list in rect_lists:
-            self.images_list.append(self.load_frames(sheet, rect_list, c.BIG_PIG_MULTIPLIER))
\ No newline at end of file
+            self.images_list.append(self.load_frames(sheet, rect_list, c.BIG_PIG_MULTIPLIER))
+
+# the pig class of each pig type
+PIG_CLASSES = {c.NORMAL_PIG:NormalPig, c.BIG_PIG:BigPig}
@@ -0,0 +1,74 @@
+__author__ = 'marble_xu'
+
+import numpy as np
+from .. import constants as c
+from . import physics
+from . import bird
+
+def get_launch_velocity(distance, angle, mass):
+    '''return the velocity (vx, vy) of a bird in pymunk coordinates after PhyBird
+       applies the launch impulse, parameters are the same as Physics.add_bird'''
+    speed = np.asarray(distance, dtype=float) * physics.LAUNCH_POWER_TIMES / mass
+    angle = np.asarray(angle, dtype=float)
+    return speed * np.cos(angle), -speed * np.sin(angle)
+
+def predict_path(distance, angle, mass, interval=0.04, duration=3.0, dt=0.002):
+    '''Return the pygame positions of the flying bird every interval seconds of
+       physics time as an int array of shape (n, 2), without collision.
+       pymunk integrates the position before the velocity, so after k steps of dt the
+       position is p0 + v0*k*dt + g*dt*dt*k*(k-1)/2, which is the exact position of
+       the simulated bird, not the continuous parabola.
+       The path stops when the bird leaves the screen or reaches the ground.'''
+    vx, vy = get_launch_velocity(distance, angle, mass)
+    x0, y0 = physics.to_pymunk(c.LAUNCH_X, c.LAUNCH_Y)
+    gx, gy = physics.GRAVITY
+    k = np.arange(1, int(duration / interval) + 1) * round(interval / dt)
+    t = k * dt
+    fall = dt * dt * k * (k - 1) * 0.5
+    x = x0 + vx * t + gx * fall
+    y = y0 + vy * t + gy * fall
+    # convert to pygame position
+    y = -(y - 600)
+    inside = (x >= 0) & (x <= c.SCREEN_WIDTH) & (y <= c.GROUND_HEIGHT)
+    # stop at the first point out of the screen
+    end = len(inside) if inside.all() else int(np.argmin(inside))
+    return np.stack((x[:end], y[:end]), axis=1).astype(int)
+
+def solve_launch(targets, bird_type, distances=None):
+    '''Find the launches of a bird whose path passes through the targets.
+       targets is a sequence of pygame positions (x, y), distances is the sling
+       distances to solve for, the default is every pixel between 10 and the rope
+       length 90 of Level.draw_sling_and_active_bird.
+       Return (distance, angle) arrays of shape (target num, distance num, 2), whose
+       elements are the parameters of Level.shoot: for every target and every sling distance there
+       are up to two angles (the low and the high arc), NaN means no solution.
+       The solution uses the continuous parabola, the simulated path differs from it
+       by less than 0.5 * gravity * dt * t, which is under 2 pixels for 2 seconds.'''
+    if distances is None:
+        distances = np.arange(10, 91)
+    mass = bird.get_bird_mass(bird_type)
+    x0, y0 = physics.to_pymunk(c.LAUNCH_X, c.LAUNCH_Y)
+    gravity = -physics.GRAVITY[1]
+
+    targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+    dx = targets[:, 0:1] - x0
+    # convert to pymunk position
+    dy = (600 - targets[:, 1:2]) - y0
+    distances = np.asarray(distances, dtype=float).reshape(1, -1)
+    speed = distances * physics.LAUNCH_POWER_TIMES / mass
+    speed2 = speed * speed
+
+    # tan of the launch direction: (s^2 +- sqrt(s^4 - g(g*dx^2 + 2*dy*s^2))) / (g*dx)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        root = np.sqrt(speed2 * speed2 - gravity * (gravity * dx * dx + 2 * dy * speed2))
+        tangent = np.stack(((speed2 - root) / (gravity * dx),
+                            (speed2 + root) / (gravity * dx)), axis=-1)
+    # the velocity direction of a launch is sign(distance) * (cos(angle), -sin(angle)),
+    # so for both directions the angle is -atan(tangent), and the distance is
+    # negative when the target is at the left of the sling
+    angle = -np.arctan(tangent)
+    distance = np.sign(dx)[..., np.newaxis] * np.broadcast_to(distances[..., np.newaxis], angle.shape)
+    invalid = np.isnan(angle) | (dx == 0)[..., np.newaxis]
+    distance = np.where(invalid, np.nan, distance)
+    angle = np.where(invalid, np.nan, angle)
+    return distance, angle
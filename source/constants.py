@@ -10,6 +10,10 @@ SCREEN_SIZE = (SCREEN_WIDTH,SCREEN_HEIGHT)
 
 GROUND_HEIGHT = 550
 
+#the pygame position where the bird is launched from the sling
+LAUNCH_X = 154
+LAUNCH_Y = 444
+
 ORIGINAL_CAPTION = "Angry Birds"
 
 ## COLORS ##
@@ -40,6 +44,64 @@ BIRD_MULTIPLIER = 0.5
 NORMAL_PIG_MULTIPLIER = 0.4
 BIG_PIG_MULTIPLIER = 0.8
 
+#SIMULATION VERSION
+# increase it when a change of the code changes the outcome of the shots, the
+# outcomes cached by an older version are invalidated
+SIM_VERSION = 2
+
+#SIMULATED CLOCK
+# game milliseconds per second of physics time, a frame lasts 5 * 0.002 second of
+# physics time, which is 1000/60 ms of game time as a real frame at 60 fps
+SIM_MS_PER_SECOND = 1000 / 60 / (5 * 0.002)
+
+#PHYSICS SLEEPING
+SLEEP_TIME_THRESHOLD = 0.5 # seconds of idle time before a body falls asleep
+IDLE_SPEED_THRESHOLD = 5 # bodies slower than this speed (pixels per second) are idle
+BULK_SYNC = True # sync the positions of pigs and blocks with numpy arrays
+
+#PHYSICS SUBSTEPS
+SUBSTEPS = 5 # a frame is split into SUBSTEPS physics steps of 0.002 seconds
+
+#EXPLOSION
+# if True, an explosion pushes and damages the pigs and blocks on the paths of its 12
+# pieces with space queries, otherwise it shoots the pieces. The push and damage are
+# calibrated on the shipped levels, see benchmark/bench_explosion.py
+QUERY_EXPLOSION = True
+EXPLOSION_PUSH = 3400 # a piece pushes a body with reduced mass * EXPLOSION_PUSH
+EXPLOSION_DAMAGE = 1000 # and damages it like an impulse of reduced mass * EXPLOSION_DAMAGE
+
+#WORLD BOUNDS
+# the bodies out of these pygame positions are removed from the physics, a pig out of
+# them is killed. the ground spans the width of the screen, so the center of a body
+# past a side of the screen or below the ground line has fallen off it for good
+WORLD_MARGIN = 20
+WORLD_LEFT = -WORLD_MARGIN
+WORLD_RIGHT = SCREEN_WIDTH + WORLD_MARGIN
+WORLD_BOTTOM = GROUND_HEIGHT + WORLD_MARGIN
+
+#GAME LOOP
+# if True, the physics updates run at PHYSICS_RATE per second of real time and the
+# frames are drawn between them, otherwise every frame has one update
+FIXED_RATE_PHYSICS = True
+PHYSICS_RATE = 60 # physics updates per second, the game runs at real speed at 60
+RENDER_FPS = 60 # frames drawn per second at most, 0 means no limit
+MAX_FRAME_UPDATES = 5 # physics updates run for a frame at most, the game slows down if more are due
+
+#RENDER
+DIRTY_RECT_RENDER = True # only redraw and update the regions of the screen changed since the last frame
+
+#TELEMETRY
+TELEMETRY_LOG = None # the json lines file of the game events, recording is disabled if it is None
+TELEMETRY_BUFFER_SIZE = 65536 # events
+TELEMETRY_FLUSH_INTERVAL = 0.2 # seconds
+
+#PROFILE
+PROFILE_LOG = None # the json file of the frame phase timings written at exit, the profiler also runs if DEBUG is True
+
+#ROTATE CACHE
+ROTATE_ANGLE_STEP = 1 # the rotated angles of images are rounded to the multiple of this value
+ROTATE_CACHE_SIZE = 1024
+
 #STATES FOR ENTIRE GAME
 MAIN_MENU = 'main menu'
 LOAD_SCREEN = 'load screen'
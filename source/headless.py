@@ -0,0 +1,56 @@
+__author__ = 'marble_xu'
+
+from . import tool
+from . import constants as c
+from .state import level
+
+class Simulation():
+    '''Run a level without display and without drawing any sprite.
+       Shots are fed by calling shoot(), and every frame is updated as fast as
+       the CPU allows. The game time comes from a SimClock driven by the physics
+       steps, so a run always gives the same result.'''
+    def __init__(self, level_num=c.START_LEVEL_NUM, level_pack=None):
+        '''level_pack is a levelpack.LevelPack to load the level from'''
+        tool.init(headless=True)
+        self.clock = tool.SimClock()
+        self.current_time = self.clock.get_ticks()
+        self.frame_num = 0
+        self.game_info = {c.CURRENT_TIME:self.current_time,
+                          c.LEVEL_NUM:level_num,
+                          c.SCORE:0}
+        self.level = level.Level(self.clock, level_pack)
+        self.level.startup(self.current_time, self.game_info)
+
+    def step(self, mouse_pressed=False):
+        self.current_time = self.clock.get_ticks()
+        self.frame_num += 1
+        self.level.update(None, self.current_time, None, mouse_pressed)
+
+    def shoot(self, distance, angle, tap_time=None, max_time=30000):
+        '''shoot the active bird and update until the bird is dead or the level is over.
+           tap_time is the game time in milliseconds after the launch to click the mouse,
+           which triggers the ability of the bird (e.g. blue bird splits into three birds).
+           return False if there is no bird to shoot'''
+        if not self.level.shoot(distance, angle):
+            return False
+        start_time = self.current_time
+        while self.level.state == c.ATTACK:
+            elapsed = self.current_time - start_time
+            if elapsed > max_time:
+                break
+            mouse_pressed = tap_time is not None and elapsed >= tap_time
+            self.step(mouse_pressed)
+        return True
+
+    def snapshot(self):
+        return (self.level.snapshot(), self.frame_num, self.current_time)
+
+    def restore(self, snapshot):
+        level_snapshot, self.frame_num, self.current_time = snapshot
+        self.level.restore(level_snapshot)
+
+    def is_over(self):
+        return self.level.state == c.OVER
+
+    def is_victory(self):
+        return self.level.check_victory()
@@ -0,0 +1,159 @@
+'''Compile the json levels into a binary level pack and load the levels of a pack.
+   A pack has a header, an index of the levels and the fixed size records of
+   the birds, pigs and blocks of every level, the strings of the json files are
+   stored as the positions in the type tables below. The pack is memory mapped,
+   so a level is decoded only when it is loaded.
+   run: python -m source.levelpack --output source/data/levels.pack
+   which validates and packs all the json files in source/data/map.'''
+__author__ = 'marble_xu'
+
+import os
+import re
+import sys
+import json
+import mmap
+import struct
+import argparse
+from . import constants as c
+
+MAGIC = b'ABLP'
+VERSION = 1
+HEADER = struct.Struct('<4sHI') # magic, version, level num
+INDEX = struct.Struct('<iIHHI') # level num, offset, bird num, pig num, block num
+BIRD = struct.Struct('<B') # type
+PIG = struct.Struct('<Bhh') # type, x, y
+BLOCK = struct.Struct('<BBBBhh') # material, shape, type, direction, x, y
+
+BIRD_TYPES = (c.RED_BIRD, c.BLUE_BIRD, c.YELLOW_BIRD, c.BLACK_BIRD, c.WHITE_BIRD, c.BIG_RED_BIRD)
+PIG_TYPES = (c.NORMAL_PIG, c.BIG_PIG)
+MATERIALS = (c.GLASS, c.WOOD, c.STONE)
+SHAPES = (c.BEAM, c.CIRCLE)
+SHAPE_TYPES = {c.BEAM:(c.BEAM_TYPE_1, c.BEAM_TYPE_2, c.BEAM_TYPE_3,
+                       c.BEAM_TYPE_4, c.BEAM_TYPE_5, c.BEAM_TYPE_6),
+               c.CIRCLE:(c.CIRCLE_TYPE_1, c.CIRCLE_TYPE_2)}
+DIRECTIONS = (c.HORIZONTAL, c.VERTICAL)
+POSITION_RANGE = (-32768, 32767)
+
+def get_code(table, value, name, where):
+    if value not in table:
+        raise ValueError('%s: unknown %s %r, must be one of %s' % (where, name, value, list(table)))
+    return table.index(value)
+
+def get_position(data, name, where):
+    value = data.get(name)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError('%s: %s must be an integer, not %r' % (where, name, value))
+    if not POSITION_RANGE[0] <= value <= POSITION_RANGE[1]:
+        raise ValueError('%s: %s %d is out of range' % (where, name, value))
+    return value
+
+def compile_level(map_data, level_num):
+    '''validate the map data of a level in the json format, and return the records
+       (birds, pigs, blocks) of the level. raise ValueError for an invalid level'''
+    where = 'level %s' % level_num
+    for name in (c.BIRDS, c.PIGS, c.BLOCKS):
+        if not isinstance(map_data.get(name), list):
+            raise ValueError('%s: %s must be a list' % (where, name))
+
+    birds = []
+    for i, data in enumerate(map_data[c.BIRDS]):
+        birds.append((get_code(BIRD_TYPES, data.get(c.TYPE), 'bird type', '%s bird %d' % (where, i)),))
+
+    pigs = []
+    for i, data in enumerate(map_data[c.PIGS]):
+        pig_where = '%s pig %d' % (where, i)
+        pigs.append((get_code(PIG_TYPES, data.get(c.TYPE), 'pig type', pig_where),
+                     get_position(data, 'x', pig_where), get_position(data, 'y', pig_where)))
+
+    blocks = []
+    for i, data in enumerate(map_data[c.BLOCKS]):
+        block_where = '%s block %d' % (where, i)
+        shape = data.get(c.SHAPE)
+        blocks.append((get_code(MATERIALS, data.get(c.MATERIAL), 'material', block_where),
+                       get_code(SHAPES, shape, 'shape', block_where),
+                       get_code(SHAPE_TYPES[shape], data.get(c.TYPE), shape + ' type', block_where),
+                       get_code(DIRECTIONS, data.get(c.DIRECTION, c.HORIZONTAL), 'direction', block_where),
+                       get_position(data, 'x', block_where), get_position(data, 'y', block_where)))
+    return birds, pigs, blocks
+
+def compile_pack(levels, path):
+    '''levels is a dict of level num: map data, write all the levels into the pack file'''
+    records = [(level_num, compile_level(levels[level_num], level_num)) for level_num in sorted(levels)]
+    offset = HEADER.size + INDEX.size * len(records)
+    index = []
+    body = []
+    for level_num, (birds, pigs, blocks) in records:
+        index.append(INDEX.pack(level_num, offset, len(birds), len(pigs), len(blocks)))
+        data = (b''.join(BIRD.pack(*item) for item in birds) +
+                b''.join(PIG.pack(*item) for item in pigs) +
+                b''.join(BLOCK.pack(*item) for item in blocks))
+        body.append(data)
+        offset += len(data)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        f.writelines(index)
+        f.writelines(body)
+
+def load_json_levels(directory):
+    '''return a dict of level num: map data of the level_N.json files in directory'''
+    levels = {}
+    for name in os.listdir(directory):
+        match = re.match(r'level_(\d+)\.json$', name)
+        if match:
+            with open(os.path.join(directory, name)) as f:
+                levels[int(match.group(1))] = json.load(f)
+    return levels
+
+class LevelPack():
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        magic, version, level_num = HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a level pack of version %d' % (path, VERSION))
+        self.index = {}
+        for item in INDEX.iter_unpack(self.view[HEADER.size:HEADER.size + INDEX.size * level_num]):
+            self.index[item[0]] = item[1:]
+
+    def __contains__(self, level_num):
+        return level_num in self.index
+
+    def get_level_nums(self):
+        return sorted(self.index)
+
+    def get_records(self, level_num):
+        '''return the (birds, pigs, blocks) records of the level as lists of tuples'''
+        offset, bird_num, pig_num, block_num = self.index[level_num]
+        records = []
+        for record, num in ((BIRD, bird_num), (PIG, pig_num), (BLOCK, block_num)):
+            end = offset + record.size * num
+            records.append(list(record.iter_unpack(self.view[offset:end])))
+            offset = end
+        return records
+
+    def close(self):
+        if self.mmap:
+            self.view.release()
+            self.mmap.close()
+            self.mmap = None
+
+def main():
+    parser = argparse.ArgumentParser(description='validate the json levels and compile them into a level pack')
+    parser.add_argument('--input', default=os.path.join('source', 'data', 'map'),
+                        help='directory of the level_N.json files')
+    parser.add_argument('--output', required=True, help='level pack file')
+    args = parser.parse_args()
+
+    levels = load_json_levels(args.input)
+    try:
+        compile_pack(levels, args.output)
+    except ValueError as e:
+        sys.stderr.write('invalid level: %s\n' % e)
+        sys.exit(1)
+    print('packed %d levels into %s' % (len(levels), args.output))
+
+if __name__ == '__main__':
+    main()
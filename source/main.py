@@ -2,11 +2,23 @@ __author__ = 'marble_xu'
 
 import pygame as pg
 from . import tool
+from . import telemetry
+from . import profiler
 from . import constants as c
 from .state import level
 
 def main():
-    game = tool.Control()
-    state_dict = {c.LEVEL: level.Level()}
+    tool.init()
+    # started before the level is set up, so the collision callbacks are timed
+    if c.DEBUG or c.PROFILE_LOG:
+        profiler.start(c.PROFILE_LOG)
+    clock = tool.SimClock()
+    game = tool.Control(clock)
+    # the fixed rate loop of game.main() draws the frames between the updates
+    state_dict = {c.LEVEL: level.Level(clock, prefetch=True,
+                                       interpolate=c.FIXED_RATE_PHYSICS)}
     game.setup_states(state_dict, c.LEVEL)
+    if c.TELEMETRY_LOG:
+        telemetry.start(c.TELEMETRY_LOG)
     game.main()
+    telemetry.stop()
@@ -0,0 +1,175 @@
+'''Timings of the phases of a frame: the event loop, the physics steps, the collision
+   callbacks, the entity sync, the explosion check and the parts of Level.draw.
+   The durations are measured with time.perf_counter_ns() and counted into fixed
+   size histograms, whose buckets are 8 per power of two, so a percentile is
+   known within 1/8 of its value.
+   Profiling is disabled when PROFILER is None, the call sites check it first:
+       prof = profiler.PROFILER
+       start = prof.start() if prof else 0
+       ...
+       if prof:
+           prof.add(profiler.STEP, start)'''
+__author__ = 'marble_xu'
+
+import json
+import atexit
+from time import perf_counter_ns
+import pygame as pg
+from . import constants as c
+
+EVENT_LOOP = 'event_loop'
+UPDATE = 'update'
+RENDER = 'render'
+DISPLAY = 'display'
+STEP = 'step'
+COLLISION = 'collision'
+SYNC = 'sync'
+EXPLOSION = 'explosion'
+DRAW_STATIC = 'draw_static'
+DRAW_SCORE = 'draw_score'
+DRAW_PATH = 'draw_path'
+DRAW_SLING = 'draw_sling'
+DRAW_BIRDS = 'draw_birds'
+DRAW_PHYSICS = 'draw_physics'
+PHASES = (EVENT_LOOP, UPDATE, RENDER, DISPLAY, STEP, COLLISION, SYNC, EXPLOSION,
+          DRAW_STATIC, DRAW_SCORE, DRAW_PATH, DRAW_SLING, DRAW_BIRDS, DRAW_PHYSICS)
+
+SUB_BITS = 3
+SUB_NUM = 1 << SUB_BITS
+# durations below 2 * SUB_NUM ns have a bucket each, the buckets above are up to 2^40 ns
+BUCKET_NUM = 2 * SUB_NUM + (40 - SUB_BITS) * SUB_NUM
+
+PROFILER = None
+
+def get_bucket(ns):
+    bits = ns.bit_length()
+    if bits <= SUB_BITS + 1:
+        return ns
+    shift = bits - SUB_BITS - 1
+    return min(SUB_NUM * shift + (ns >> shift), BUCKET_NUM - 1)
+
+def get_bucket_range(index):
+    '''return the (lowest, highest) durations in ns counted into the bucket'''
+    if index < 2 * SUB_NUM:
+        return index, index
+    shift, top = divmod(index, SUB_NUM)
+    shift -= 1
+    low = (top + SUB_NUM) << shift
+    return low, low + (1 << shift) - 1
+
+class Histogram():
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * BUCKET_NUM
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        self.buckets[get_bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def get_percentile(self, percent):
+        '''return the middle of the bucket of the percentile in ns'''
+        if self.count == 0:
+            return 0
+        rank = self.count * percent / 100
+        total = 0
+        for index, num in enumerate(self.buckets):
+            total += num
+            if num and total >= rank:
+                low, high = get_bucket_range(index)
+                return min((low + high) / 2, self.max)
+        return self.max
+
+    def get_stats(self):
+        '''return the stats in milliseconds'''
+        return {'count':self.count,
+                'total_ms':self.total / 1e6,
+                'mean_ms':self.total / self.count / 1e6 if self.count else 0,
+                'p50_ms':self.get_percentile(50) / 1e6,
+                'p99_ms':self.get_percentile(99) / 1e6,
+                'max_ms':self.max / 1e6}
+
+class Profiler():
+    def __init__(self, path=None):
+        '''path is the json file the stats are exported to by stop()'''
+        self.path = path
+        self.histograms = {phase:Histogram() for phase in PHASES}
+        self.font = None
+
+    def start(self):
+        return perf_counter_ns()
+
+    def add(self, phase, start):
+        '''count the time from start to now into the phase, return now,
+           which is the start of the next phase'''
+        now = perf_counter_ns()
+        self.histograms[phase].add(now - start)
+        return now
+
+    def wrap(self, phase, func):
+        '''return a function calling func, whose time is counted into the phase'''
+        def timed(*args):
+            start = perf_counter_ns()
+            result = func(*args)
+            self.add(phase, start)
+            return result
+        return timed
+
+    def get_stats(self):
+        return {phase:histogram.get_stats() for phase, histogram in self.histograms.items()
+                if histogram.count}
+
+    def export(self, path):
+        '''write the stats and the non-empty buckets of every phase as json'''
+        result = {}
+        for phase, histogram in self.histograms.items():
+            if histogram.count:
+                stats = histogram.get_stats()
+                stats['buckets'] = [get_bucket_range(index) + (num,)
+                                    for index, num in enumerate(histogram.buckets) if num]
+                result[phase] = stats
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=1)
+
+    def get_report(self):
+        lines = ['%-13s %8s %8s %8s %8s' % ('phase', 'count', 'mean', 'p99', 'max')]
+        for phase, stats in self.get_stats().items():
+            lines.append('%-13s %8d %8.3f %8.3f %8.3f' % (phase, stats['count'], stats['mean_ms'],
+                         stats['p99_ms'], stats['max_ms']))
+        return lines
+
+    def draw(self, surface):
+        '''draw the report of the phases in milliseconds as an overlay'''
+        if self.font is None:
+            self.font = pg.font.SysFont('couriernew', 14, bold=True)
+        x, y = c.SCREEN_WIDTH - 420, 60
+        for line in self.get_report():
+            surface.blit(self.font.render(line, 1, c.WHITE, c.BLACK), (x, y))
+            y += 16
+
+def wrap(phase, func):
+    '''return func timed into the phase if profiling is started, func itself otherwise'''
+    if PROFILER:
+        return PROFILER.wrap(phase, func)
+    return func
+
+def start(path=None):
+    '''start profiling, the stats are exported to path at exit if it is not None'''
+    global PROFILER
+    PROFILER = Profiler(path)
+    if path:
+        atexit.register(stop)
+    return PROFILER
+
+def stop():
+    global PROFILER
+    if PROFILER:
+        profiler, PROFILER = PROFILER, None
+        if profiler.path:
+            profiler.export(profiler.path)
@@ -0,0 +1,159 @@
+'''Cache of shot outcomes with a memory LRU tier and a sqlite disk tier.
+   A shot is keyed by (level hash, bird position, bird type,
+   quantized distance, quantized angle, quantized tap time), the level hash covers
+   the json file of the level and the simulation settings, so editing the json file
+   of a level, a new SIM_VERSION or a change of the physics constants invalidates
+   the cached outcomes.'''
+__author__ = 'marble_xu'
+
+import os
+import json
+import sqlite3
+import hashlib
+from collections import OrderedDict
+from . import constants as c
+from .state import level
+
+DISTANCE_STEP = 0.5 # pixel
+ANGLE_STEP = 0.001 # radian
+TAP_TIME_STEP = 10 # millisecond
+MEMORY_SIZE = 10000
+DISK_SIZE = 1000000
+# the constants changing the outcome of a shot
+SIM_SETTINGS = ('SIM_VERSION', 'SIM_MS_PER_SECOND', 'SLEEP_TIME_THRESHOLD',
+                'IDLE_SPEED_THRESHOLD', 'SUBSTEPS', 'QUERY_EXPLOSION', 'EXPLOSION_PUSH',
+                'EXPLOSION_DAMAGE', 'WORLD_LEFT', 'WORLD_RIGHT', 'WORLD_BOTTOM')
+
+def get_settings_hash():
+    settings = [(name, getattr(c, name)) for name in SIM_SETTINGS]
+    return hashlib.sha1(repr(settings).encode()).hexdigest()
+
+class ShotCache():
+    def __init__(self, path=None, memory_size=MEMORY_SIZE, disk_size=DISK_SIZE):
+        '''path is the sqlite file of the disk tier, there is only the memory tier if it is None'''
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.level_infos = {} # level num: (mtime, settings hash, level hash, bird types)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS outcomes (key TEXT PRIMARY KEY, '
+                            'level INTEGER, value TEXT, access INTEGER)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS outcomes_access ON outcomes (access)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS levels (level INTEGER PRIMARY KEY, hash TEXT)')
+            self.db.commit()
+            row = self.db.execute('SELECT MAX(access) FROM outcomes').fetchone()
+            self.access = row[0] or 0
+
+    def get_level_info(self, level_num):
+        '''return (level hash, bird types) of the level, the level hash is made of the
+           content of the json file and the simulation settings, the outcomes of the
+           level are removed from the cache when it is changed'''
+        file_path = level.get_map_path(level_num)
+        mtime = os.stat(file_path).st_mtime_ns
+        settings_hash = get_settings_hash()
+        info = self.level_infos.get(level_num)
+        if info and info[0] == mtime and info[1] == settings_hash:
+            return info[2:]
+
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        level_hash = hashlib.sha1(content + settings_hash.encode()).hexdigest()
+        bird_types = [data[c.TYPE] for data in json.loads(content)[c.BIRDS]]
+        if info and info[2] != level_hash:
+            self.invalidate_memory(level_num)
+        if self.db:
+            row = self.db.execute('SELECT hash FROM levels WHERE level = ?', (level_num,)).fetchone()
+            if row is None or row[0] != level_hash:
+                self.db.execute('DELETE FROM outcomes WHERE level = ?', (level_num,))
+                self.db.execute('INSERT OR REPLACE INTO levels VALUES (?, ?)', (level_num, level_hash))
+                self.db.commit()
+        self.level_infos[level_num] = (mtime, settings_hash, level_hash, bird_types)
+        return level_hash, bird_types
+
+    def invalidate_memory(self, level_num):
+        for key in [key for key, item in self.memory.items() if item[0] == level_num]:
+            del self.memory[key]
+
+    def quantize(self, distance, angle, tap_time=None):
+        '''return the shot snapped to the cache steps, the outcome of a cached shot is
+           the outcome of the quantized shot, so the shot must be simulated with these values'''
+        distance = round(distance / DISTANCE_STEP) * DISTANCE_STEP
+        angle = round(angle / ANGLE_STEP) * ANGLE_STEP
+        if tap_time is not None:
+            tap_time = round(tap_time / TAP_TIME_STEP) * TAP_TIME_STEP
+        return distance, angle, tap_time
+
+    def make_key(self, level_num, distance, angle, bird_index=0, tap_time=None):
+        '''return None if there is no bird at bird_index'''
+        level_hash, bird_types = self.get_level_info(level_num)
+        if bird_index >= len(bird_types):
+            return None
+        if tap_time is None:
+            tap_key = '-'
+        else:
+            tap_key = round(tap_time / TAP_TIME_STEP)
+        return '%s:%d:%s:%d:%d:%s' % (level_hash, bird_index, bird_types[bird_index],
+                    round(distance / DISTANCE_STEP), round(angle / ANGLE_STEP), tap_key)
+
+    def get(self, key):
+        item = self.memory.get(key)
+        if item is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return item[1]
+
+        if self.db:
+            row = self.db.execute('SELECT level, value FROM outcomes WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.access += 1
+                self.db.execute('UPDATE outcomes SET access = ? WHERE key = ?', (self.access, key))
+                outcome = json.loads(row[1])
+                self.put_memory(key, row[0], outcome)
+                self.disk_hits += 1
+                return outcome
+        self.misses += 1
+        return None
+
+    def put(self, key, level_num, outcome):
+        self.put_memory(key, level_num, outcome)
+        if self.db:
+            self.access += 1
+            self.db.execute('INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?)',
+                            (key, level_num, json.dumps(outcome), self.access))
+
+    def put_memory(self, key, level_num, outcome):
+        self.memory[key] = (level_num, outcome)
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def flush(self):
+        '''remove the least recently used outcomes over the disk size and commit'''
+        if self.db is None:
+            return
+        count = self.db.execute('SELECT COUNT(*) FROM outcomes').fetchone()[0]
+        if count > self.disk_size:
+            self.db.execute('DELETE FROM outcomes WHERE key IN (SELECT key FROM outcomes '
+                            'ORDER BY access LIMIT ?)', (count - self.disk_size,))
+        self.db.commit()
+
+    def close(self):
+        if self.db:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+    def get_stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        stats = {'lookups':lookups, 'memory_hits':self.memory_hits,
+                 'disk_hits':self.disk_hits, 'misses':self.misses,
+                 'hit_rate':(lookups - self.misses) / lookups if lookups else 0.0,
+                 'memory_size':len(self.memory)}
+        if self.db:
+            stats['disk_size'] = self.db.execute('SELECT COUNT(*) FROM outcomes').fetchone()[0]
+        return stats
@@ -3,12 +3,36 @@ __author__ = 'marble_xu'
 import os
 import json
 import math
+import time
+import threading
 import pygame as pg
 from .. import tool
+from .. import levelpack
+from .. import telemetry
+from .. import profiler
 from .. import constants as c
-from ..component import button, physics, bird, pig, block
-
-bold_font = pg.font.SysFont("arial", 30, bold=True)
+from ..component import button, physics, bird, pig, block, trajectory
+
+bold_font = None
+SCORE_AREA = (1020, c.BUTTON_HEIGHT, 180, 40)
+# the rope of the sling at rest, pygame draws a thick line differently when it is
+# clipped, so it is always redrawn as a whole
+ROPE_AREA = (130, 435, 35, 16)
+# the classes and types of the birds, pigs and blocks indexed by the codes of the
+# level records, see levelpack
+BIRD_CLASSES = [bird.BIRD_CLASSES[type] for type in levelpack.BIRD_TYPES]
+PIG_CLASSES = [pig.PIG_CLASSES[type] for type in levelpack.PIG_TYPES]
+BLOCK_CLASSES = [[block.BLOCK_CLASSES[material, shape] for shape in levelpack.SHAPES]
+                 for material in levelpack.MATERIALS]
+BLOCK_TYPES = [levelpack.SHAPE_TYPES[shape] for shape in levelpack.SHAPES]
+BEAM_CODE = levelpack.SHAPES.index(c.BEAM)
+
+def get_bold_font():
+    '''the font is created at the first draw, so headless mode never needs pygame font'''
+    global bold_font
+    if bold_font is None:
+        bold_font = pg.font.SysFont("arial", 30, bold=True)
+    return bold_font
 
 def vector(p0, p1):
     """Return the vector of the points
@@ -27,10 +51,139 @@ def unit_vector(v):
     ub = v[1] / h
     return (ua, ub)
 
-class Level(tool.State):
+def get_path_point_size(index):
+    if index % 3 == 0:
+        return 4
+    elif index % 3 == 1:
+        return 5
+    return 6
+
+def merge_rects(rects):
+    '''return the list of rects with the overlapping rects merged into their union'''
+    merged = []
+    for rect in rects:
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect = rect.union(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+def get_map_path(level_num):
+    map_file = 'level_' + str(level_num) + '.json'
+    return os.path.join('source', 'data', 'map', map_file)
+
+def has_map(level_num, level_pack=None):
+    if level_pack and level_num in level_pack:
+        return True
+    return os.path.exists(get_map_path(level_num))
+
+def load_map_data(level_num, level_pack=None):
+    '''return the (birds, pigs, blocks) records of the level, see levelpack, a json
+       level is compiled into the same records'''
+    if level_pack and level_num in level_pack:
+        return level_pack.get_records(level_num)
+    with open(get_map_path(level_num)) as f:
+        return levelpack.compile_level(json.load(f), level_num)
+
+def create_birds(map_data):
+    birds = []
+    y = c.GROUND_HEIGHT
+    for i, (type,) in enumerate(map_data[0]):
+        x = 120 - (i*35)
+        birds.append(BIRD_CLASSES[type](x, y))
+    return birds
+
+def add_pigs(map_data, phy):
+    for type, x, y in map_data[1]:
+        phy.add_pig(PIG_CLASSES[type](x, y))
+
+def add_blocks(map_data, phy):
+    for material, shape, type, direction, x, y in map_data[2]:
+        block_class = BLOCK_CLASSES[material][shape]
+        if shape == BEAM_CODE:
+            item = block_class(x, y, BLOCK_TYPES[shape][type], levelpack.DIRECTIONS[direction])
+        else:
+            item = block_class(x, y, BLOCK_TYPES[shape][type])
+        phy.add_block(item)
+
+class LevelPrefetcher():
+    '''Load a level on a worker thread while the current level is playing.
+       The map data, the birds and a new Physics with the pigs and blocks of the level
+       are staged, the Level takes them in reset() instead of loading the level.'''
     def __init__(self):
+        self.thread = None
+        self.level_num = None
+        self.staged = None
+
+    def start(self, level_num, level_pack, phy):
+        '''phy is the physics of the current level, the staged physics has the same settings'''
+        if self.level_num == level_num or not has_map(level_num, level_pack):
+            return
+        self.wait()
+        self.level_num = level_num
+        self.staged = None
+        self.thread = threading.Thread(target=self.load, daemon=True,
+                        args=(level_num, level_pack, phy.clock, phy.sleep_time_threshold,
+                              phy.idle_speed_threshold, phy.bulk_sync,
+                              phy.interpolate, phy.query_explosion))
+        self.thread.start()
+
+    def load(self, level_num, level_pack, clock, sleep_time_threshold,
+             idle_speed_threshold, bulk_sync, interpolate, query_explosion):
+        start = time.perf_counter()
+        map_data = load_map_data(level_num, level_pack)
+        phy = physics.Physics(clock, sleep_time_threshold, idle_speed_threshold, bulk_sync,
+                              interpolate, query_explosion)
+        birds = create_birds(map_data)
+        add_pigs(map_data, phy)
+        add_blocks(map_data, phy)
+        self.staged = (map_data, birds, phy, (time.perf_counter() - start) * 1000)
+
+    def wait(self):
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def take(self, level_num):
+        '''return the staged (map data, birds, physics, load time in milliseconds) of the
+           level and the time in milliseconds waited for the worker to finish.
+           return None if level_num is not the prefetched level'''
+        if self.level_num != level_num:
+            return None
+        start = time.perf_counter()
+        self.wait()
+        wait_time = (time.perf_counter() - start) * 1000
+        staged, self.staged, self.level_num = self.staged, None, None
+        if staged is None:
+            return None
+        return staged, wait_time
+
+class Level(tool.State):
+    def __init__(self, clock=None, level_pack=None, prefetch=False, interpolate=False):
+        '''clock must be the same as the clock of tool.Control, which gives the current time.
+           level_pack is a levelpack.LevelPack, the levels in it are loaded from the pack
+           instead of the json files.
+           if prefetch is True, the next level is loaded on a worker thread while
+           the current level is playing.
+           if interpolate is True, render() draws the bodies between their positions of
+           the last two updates, which is set for the fixed rate loop of tool.Control'''
         tool.State.__init__(self)
         self.player = None
+        self.level_pack = level_pack
+        self.clock = clock if clock else tool.SimClock()
+        self.physics = physics.Physics(self.clock, interpolate=interpolate)
+        self.prefetcher = LevelPrefetcher() if prefetch else None
+        self.dirty_render = c.DIRTY_RECT_RENDER
+        # the scaled background and the layer of the things never changed on the screen,
+        # they are kept across resets
+        self.background = None
+        self.static_layer = None
+        self.score_image = None
+        self.score_image_value = None
+        # (level num, load time, exposed time) of every reset, the times are in milliseconds,
+        # the load time is hidden by the prefetch except the exposed time
+        self.load_stats = []
 
     def startup(self, current_time, persist):
         self.game_info = persist
@@ -41,25 +194,70 @@ class Level(tool.State):
     def reset(self):
         self.score = self.game_info[c.SCORE]
         self.state = c.IDLE
-        self.physics = physics.my_phy
-        self.physics.reset(self)
-        self.load_map()
+        level_num = self.game_info[c.LEVEL_NUM]
+        start = time.perf_counter()
+        staged = self.prefetcher.take(level_num) if self.prefetcher else None
+        if staged:
+            (self.map_data, birds, self.physics, load_time), wait_time = staged
+            self.physics.set_level(self)
+        else:
+            self.physics.reset(self)
+            self.load_map()
+            birds = None
         self.setup_background()
         self.setup_buttons()
         self.setup_sling()
-        self.setup_birds()
-        self.setup_pigs()
-        self.setup_blocks()
+        self.setup_birds(birds)
+        if not staged:
+            self.setup_pigs()
+            self.setup_blocks()
         self.over_timer = 0
+        self.full_redraw = True
+
+        exposed_time = (time.perf_counter() - start) * 1000
+        if not staged:
+            load_time = exposed_time
+        self.load_stats.append((level_num, load_time, exposed_time))
+        if c.DEBUG:
+            print('level %d load: %.1fms, exposed: %.1fms' % (level_num, load_time, exposed_time))
+        if self.prefetcher:
+            self.prefetcher.start(level_num + 1, self.level_pack, self.physics)
+
+    def snapshot(self):
+        '''capture the state of the level: the birds, pigs, blocks and their bodies,
+           the birds remaining and the score. restore() rewrites the existing sprites
+           and rebuilds the physics space without loading the level again.
+           A snapshot is invalid after reset()'''
+        return {'level':(self.state, self.score, list(self.birds), self.active_bird,
+                         list(self.bird_path), list(self.bird_old_path), self.over_timer,
+                         self.sling_click, self.mouse_distance, self.sling_angle,
+                         self.done, self.next, dict(self.game_info)),
+                'birds':[item.save_state() for item in self.birds],
+                'physics':self.physics.snapshot(),
+                'clock':self.clock.snapshot()}
+
+    def restore(self, snapshot):
+        (self.state, self.score, birds, self.active_bird, bird_path, bird_old_path,
+         self.over_timer, self.sling_click, self.mouse_distance, self.sling_angle,
+         self.done, self.next, game_info) = snapshot['level']
+        self.birds = list(birds)
+        self.bird_path = list(bird_path)
+        self.bird_old_path = list(bird_old_path)
+        # game_info is shared with tool.Control, so update it in place
+        self.game_info.update(game_info)
+        self.current_time = self.game_info[c.CURRENT_TIME]
+        self.physics.restore(snapshot['physics'])
+        for item, state in zip(self.birds, snapshot['birds']):
+            item.load_state(state)
+        self.clock.restore(snapshot['clock'])
+        self.full_redraw = True
 
     def load_map(self):
-        map_file = 'level_' + str(self.game_info[c.LEVEL_NUM]) + '.json'
-        file_path = os.path.join('source', 'data', 'map', map_file)
-        f = open(file_path)
-        self.map_data = json.load(f)
-        f.close()
+        self.map_data = load_map_data(self.game_info[c.LEVEL_NUM], self.level_pack)
 
     def setup_background(self):
+        if self.background:
+            return
         self.background = tool.GFX['background']
         self.bg_rect = self.background.get_rect()
         self.background = pg.transform.scale(self.background, 
@@ -91,43 +289,42 @@ class Level(tool.State):
         self.sling_click = False
         self.mouse_distance = 0
         self.sling_angle = 0
+        self.trajectory_key = None
+        self.trajectory = []
 
-    def setup_birds(self):
-        self.birds = []
-        y = c.GROUND_HEIGHT
-
-        for i, data in enumerate(self.map_data[c.BIRDS]):
-            x = 120 - (i*35)
-            tmp = bird.create_bird(data[c.TYPE], x, y)
-            if tmp:
-                self.birds.append(tmp)
+    def setup_birds(self, birds=None):
+        '''birds are the birds created by the prefetcher'''
+        self.birds = birds if birds is not None else create_birds(self.map_data)
         self.bird_path = []
         self.bird_old_path = []
         self.active_bird = None
         self.select_bird()
 
     def setup_pigs(self):
-        for data in self.map_data[c.PIGS]:
-            tmp = pig.create_pig(data[c.TYPE], data['x'], data['y'])
-            if tmp:
-                self.physics.add_pig(tmp)
+        add_pigs(self.map_data, self.physics)
                 
     def setup_blocks(self):
-        for data in self.map_data[c.BLOCKS]:
-            if c.DIRECTION in data:
-                direction = data[c.DIRECTION]
-            else:
-                direction = 0
-            tmp = block.create_block(data['x'], data['y'], data[c.MATERIAL],
-                              data[c.SHAPE], data[c.TYPE], direction)
-            if tmp:
-                self.physics.add_block(tmp)
+        add_blocks(self.map_data, self.physics)
 
     def update(self, surface, current_time, mouse_pos, mouse_pressed):
+        '''surface is None when the scene is drawn by render()'''
         self.game_info[c.CURRENT_TIME] = self.current_time = current_time
         self.handle_states(mouse_pos, mouse_pressed)
         self.check_game_state()
+        if surface is not None and not tool.HEADLESS:
+            self.draw(surface)
+
+    def render(self, surface, alpha):
+        '''draw the scene with the bodies at alpha (0 to 1) of the way between their
+           positions of the last two updates, the positions of the sprites are
+           restored after drawing, so rendering never changes the game.
+           Without interpolate, the bodies are drawn at their current positions'''
+        if not self.physics.interpolate:
+            self.draw(surface)
+            return
+        saved = self.physics.interpolate_positions(alpha)
         self.draw(surface)
+        self.physics.restore_positions(saved)
     
     def handle_states(self, mouse_pos, mouse_pressed):
         if self.state == c.IDLE:
@@ -157,14 +354,7 @@ class Level(tool.State):
         if not mouse_pressed:
             if self.sling_click:
                 self.sling_click = False
-                xo = 154
-                yo = 444
-                self.physics.add_bird(self.active_bird, self.mouse_distance,
-                                      self.sling_angle, xo, yo)
-                self.active_bird.set_attack()
-                self.birds.remove(self.active_bird)
-                self.physics.enable_check_collide()
-                self.state = c.ATTACK
+                self.launch_bird(self.mouse_distance, self.sling_angle)
         elif not self.sling_click:
             if mouse_pos:
                 mouse_x, mouse_y = mouse_pos
@@ -172,6 +362,29 @@ class Level(tool.State):
                     mouse_y > 370 and mouse_y < 550):
                     self.sling_click = True
 
+    def launch_bird(self, distance, angle):
+        # the values may be numpy floats, e.g. from trajectory.solve_launch, and a
+        # numpy float times a Vec2d is an array
+        distance, angle = float(distance), float(angle)
+        if telemetry.RECORDER:
+            telemetry.RECORDER.record(telemetry.SHOT, self.game_info[c.CURRENT_TIME],
+                                      self.active_bird.name, distance, angle)
+        self.physics.add_bird(self.active_bird, distance, angle, c.LAUNCH_X, c.LAUNCH_Y)
+        self.active_bird.set_attack()
+        self.birds.remove(self.active_bird)
+        self.physics.enable_check_collide()
+        self.state = c.ATTACK
+
+    def shoot(self, distance, angle):
+        '''shoot the active bird without mouse, parameters are the same as the values
+           set by draw_sling_and_active_bird: distance is the length of the rope
+           (negative when the mouse is at the right of the sling), angle is in radians'''
+        if self.state != c.IDLE or self.active_bird is None:
+            return False
+        self.sling_click = False
+        self.launch_bird(distance, angle)
+        return True
+
     def draw_sling_and_active_bird(self, surface):
         sling_x, sling_y = 135, 450
         sling2_x, sling2_y = 160, 450
@@ -216,11 +429,22 @@ class Level(tool.State):
                 self.mouse_distance = mouse_distance
             else:
                 self.mouse_distance = -mouse_distance
+            self.draw_trajectory(surface)
         else:
             pg.draw.line(surface, (0, 0, 0), (sling_x, sling_y-8), (sling2_x, sling2_y-7), 5)
             if self.active_bird.state == c.IDLE:
                 self.active_bird.draw(surface)
 
+    def draw_trajectory(self, surface):
+        '''draw the predicted path of the active bird if it is launched now,
+           the path is only computed again when the sling is moved'''
+        key = (self.mouse_distance, self.sling_angle, self.active_bird.mass)
+        if key != self.trajectory_key:
+            self.trajectory_key = key
+            self.trajectory = trajectory.predict_path(*key).tolist()
+        for pos in self.trajectory:
+            pg.draw.circle(surface, c.WHITE, pos, 3, 0)
+
     def check_button_click(self, mouse_pos, mouse_pressed):
         if mouse_pressed and mouse_pos:
             for button in self.buttons:
@@ -264,33 +488,115 @@ class Level(tool.State):
 
     def draw_bird_path(self, surface, path):
         for i, pos in enumerate(path):
-            if i % 3 == 0:
-                size = 4
-            elif i % 3 == 1:
-                size = 5
-            else:
-                size = 6
-            pg.draw.circle(surface, c.WHITE, pos, size, 0)
+            pg.draw.circle(surface, c.WHITE, pos, get_path_point_size(i), 0)
+
+    def get_drawn_state(self):
+        '''return the state of the things which can change on the screen: the (position,
+           image) of every sprite, the points of the bird paths and the score'''
+        sprites = {}
+        for item in (self.birds + self.physics.birds + self.physics.pigs +
+                     self.physics.blocks + self.physics.eggs):
+            sprites[item] = (item.rect.topleft, item.image)
+        path = set()
+        for points in (self.bird_old_path, self.bird_path):
+            path.update((pos, get_path_point_size(i)) for i, pos in enumerate(points))
+        return sprites, path, self.score, self.sling_click
+
+    def get_dirty_rects(self, drawn):
+        '''return the regions of the screen changed between the last drawn state and drawn,
+           a sprite at rest with the same image is not in the regions'''
+        sprites, path, score, sling_click = drawn
+        old_sprites, old_path, old_score, old_sling_click = self.drawn
+        rects = []
+        for item, state in sprites.items():
+            old_state = old_sprites.get(item)
+            if state != old_state:
+                rects.append(pg.Rect(state[0], state[1].get_size()))
+                if old_state:
+                    rects.append(pg.Rect(old_state[0], old_state[1].get_size()))
+        for item, old_state in old_sprites.items():
+            if item not in sprites:
+                rects.append(pg.Rect(old_state[0], old_state[1].get_size()))
+        for (x, y), size in path ^ old_path:
+            rects.append(pg.Rect(x - size, y - size, size * 2 + 1, size * 2 + 1))
+        if score != old_score:
+            rects.append(pg.Rect(SCORE_AREA))
+        rope_rect = pg.Rect(ROPE_AREA)
+        if rope_rect.collidelist(rects) != -1:
+            rects.append(rope_rect)
+        return merge_rects(rects)
 
     def draw(self, surface):
-        surface.fill(c.GRASS_GREEN)
-        surface.blit(self.background, self.bg_rect)
-        for button in self.buttons:
-            button.draw(surface)
-
-        score_font = bold_font.render("SCORE:", 1, c.WHITE)
-        number_font = bold_font.render(str(self.score), 1, c.WHITE)
-        surface.blit(score_font, (1020, c.BUTTON_HEIGHT))
-        surface.blit(number_font, (1120, c.BUTTON_HEIGHT))
+        '''if dirty_render is True, only the regions changed since the last frame are
+           drawn and self.dirty_rects is set to them for pg.display.update(),
+           otherwise the whole scene is drawn and self.dirty_rects is None.
+           The whole scene is drawn after reset and while aiming, the rope and the
+           predicted path follow the mouse'''
+        if not self.dirty_render or c.DEBUG:
+            self.dirty_rects = None
+            self.full_redraw = True
+            self.draw_scene(surface)
+            return
+
+        drawn = self.get_drawn_state()
+        if self.full_redraw or self.sling_click or self.drawn[3]:
+            self.full_redraw = False
+            self.dirty_rects = None
+            self.draw_scene(surface)
+        else:
+            self.dirty_rects = self.get_dirty_rects(drawn)
+            for rect in self.dirty_rects:
+                surface.set_clip(rect)
+                self.draw_scene(surface)
+            surface.set_clip(None)
+        self.drawn = drawn
+
+    def get_static_layer(self, surface):
+        '''return the background, the buttons and the score label drawn into one image,
+           the sling images are not in it, because the bird path is drawn under them'''
+        if self.static_layer is None:
+            layer = pg.Surface(surface.get_size()).convert(surface)
+            layer.fill(c.GRASS_GREEN)
+            layer.blit(self.background, self.bg_rect)
+            for button in self.buttons:
+                button.draw(layer)
+            layer.blit(get_bold_font().render("SCORE:", 1, c.WHITE), (1020, c.BUTTON_HEIGHT))
+            self.static_layer = layer
+        return self.static_layer
+
+    def get_score_image(self):
+        '''the score text is only rendered when the score is changed'''
+        if self.score_image_value != self.score:
+            self.score_image = get_bold_font().render(str(self.score), 1, c.WHITE)
+            self.score_image_value = self.score
+        return self.score_image
+
+    def draw_scene(self, surface):
+        prof = profiler.PROFILER
+        start = prof.start() if prof else 0
+        surface.blit(self.get_static_layer(surface), (0, 0))
+        if prof:
+            start = prof.add(profiler.DRAW_STATIC, start)
+        surface.blit(self.get_score_image(), (1120, c.BUTTON_HEIGHT))
+        if prof:
+            start = prof.add(profiler.DRAW_SCORE, start)
 
         self.draw_bird_path(surface, self.bird_old_path)
         self.draw_bird_path(surface, self.bird_path)
+        if prof:
+            start = prof.add(profiler.DRAW_PATH, start)
 
         surface.blit(self.sling1_image, self.sling1_rect)
         self.draw_sling_and_active_bird(surface)
+        if prof:
+            start = prof.add(profiler.DRAW_SLING, start)
         for bird in self.birds:
             bird.draw(surface)
         
         surface.blit(self.sling2_image, self.sling2_rect)
+        if prof:
+            start = prof.add(profiler.DRAW_BIRDS, start)
 
-        self.physics.draw(surface)
\ No newline at end of file
+        self.physics.draw(surface)
+        if prof:
+            prof.add(profiler.DRAW_PHYSICS, start)
\ No newline at end of file
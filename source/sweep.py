@@ -0,0 +1,167 @@
+'''Evaluate a grid of (sling distance, sling angle) shots of a level on all the cores.
+   run: python -m source.sweep --level 1 --distance 30 90 7 --angle -60 30 10
+   which prints a csv table of the outcome of every shot.'''
+__author__ = 'marble_xu'
+
+import os
+import sys
+import csv
+import math
+import argparse
+import multiprocessing
+if __name__ == '__main__':
+    # the csv table is written to stdout, keep the import banners of pygame and pymunk out of it
+    import pymunkoptions
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    pymunkoptions.options['debug'] = False
+from . import tool
+from . import headless
+from . import constants as c
+from . import shotcache
+
+FIELDS = ['level', 'bird_index', 'bird', 'distance', 'angle', 'pigs_killed',
+          'blocks_destroyed', 'score', 'sim_time', 'victory']
+
+def skip_birds(level, bird_index):
+    '''remove the birds before bird_index, so the bird at bird_index becomes the active bird'''
+    if bird_index >= len(level.birds):
+        return False
+    del level.birds[:bird_index]
+    level.select_bird()
+    return True
+
+def run_shot(level_num, distance, angle, bird_index=0, tap_time=None, settle_time=5000):
+    '''shoot the bird at bird_index of a new level, the shot goes through
+       Level.shoot as if the mouse was released at (distance, angle) of the sling.
+       After the bird is dead, the level is updated until all the bodies are at rest
+       or settle_time milliseconds of game time are passed.
+       angle is in radians, sim_time of the outcome is the game time in milliseconds'''
+    sim = headless.Simulation(level_num)
+    level = sim.level
+    outcome = {'level':level_num, 'bird_index':bird_index, 'bird':None,
+               'distance':distance, 'angle':angle, 'pigs_killed':0,
+               'blocks_destroyed':0, 'score':0, 'sim_time':0, 'victory':False}
+    if not skip_birds(level, bird_index):
+        return outcome
+
+    outcome['bird'] = level.active_bird.name
+    pig_num = len(level.physics.pigs)
+    block_num = len(level.physics.blocks)
+    score = level.score
+    start_time = sim.current_time
+
+    sim.shoot(distance, angle, tap_time)
+    settle_start = sim.current_time
+    while (not level.physics.is_at_rest() and
+           (sim.current_time - settle_start) < settle_time):
+        sim.step()
+
+    outcome['pigs_killed'] = pig_num - len(level.physics.pigs)
+    outcome['blocks_destroyed'] = block_num - len(level.physics.blocks)
+    outcome['score'] = level.score - score
+    outcome['sim_time'] = sim.current_time - start_time
+    outcome['victory'] = level.check_victory()
+    return outcome
+
+def make_grid(distance_range, angle_range):
+    '''return the list of (distance, angle) shots, a range is (start, stop, num),
+       the angle range is in degrees and the returned angles are in radians'''
+    def linspace(start, stop, num):
+        if num <= 1:
+            return [start]
+        return [start + (stop - start) * i / (num - 1) for i in range(num)]
+
+    grid = []
+    for distance in linspace(*distance_range):
+        for angle in linspace(*angle_range):
+            grid.append((distance, math.radians(angle)))
+    return grid
+
+def init_worker():
+    tool.init(headless=True)
+
+def run_task(task):
+    return run_shot(*task)
+
+def sweep(level_nums, grid, bird_index=0, tap_time=None, processes=None, cache=None):
+    '''run every (distance, angle) shot of grid for every level in a process pool,
+       return the outcomes ordered by level and then by grid.
+       If cache is a ShotCache, the shots are quantized to the cache steps and
+       only the shots not in the cache are simulated'''
+    tasks = []
+    for level_num in level_nums:
+        for distance, angle in grid:
+            if cache:
+                distance, angle, tap = cache.quantize(distance, angle, tap_time)
+            else:
+                tap = tap_time
+            tasks.append((level_num, distance, angle, bird_index, tap))
+
+    outcomes = [None] * len(tasks)
+    keys = [None] * len(tasks)
+    missing = []
+    for i, task in enumerate(tasks):
+        if cache:
+            level_num, distance, angle, bird_index, tap = task
+            keys[i] = cache.make_key(level_num, distance, angle, bird_index, tap)
+            if keys[i]:
+                outcomes[i] = cache.get(keys[i])
+        if outcomes[i] is None:
+            missing.append(i)
+
+    if missing:
+        processes = min(processes or os.cpu_count() or 1, len(missing))
+        chunksize = max(1, len(missing) // (processes * 4))
+        with multiprocessing.Pool(processes, initializer=init_worker) as pool:
+            results = pool.map(run_task, [tasks[i] for i in missing], chunksize)
+        for i, outcome in zip(missing, results):
+            outcomes[i] = outcome
+            if cache and keys[i]:
+                cache.put(keys[i], tasks[i][0], outcome)
+        if cache:
+            cache.flush()
+    return outcomes
+
+def write_table(outcomes, f):
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    for outcome in outcomes:
+        writer.writerow(outcome)
+
+def main():
+    parser = argparse.ArgumentParser(description='evaluate a grid of shots of a level')
+    parser.add_argument('--level', type=int, nargs='+', default=[c.START_LEVEL_NUM],
+                        help='level numbers')
+    parser.add_argument('--distance', type=float, nargs=3, default=[10, 90, 17],
+                        metavar=('START', 'STOP', 'NUM'), help='sling distance range')
+    parser.add_argument('--angle', type=float, nargs=3, default=[-80, 40, 25],
+                        metavar=('START', 'STOP', 'NUM'), help='sling angle range in degrees')
+    parser.add_argument('--bird-index', type=int, default=0, help='position of the bird to shoot')
+    parser.add_argument('--tap-time', type=float, default=None,
+                        help='game time in milliseconds to trigger the bird ability after launch')
+    parser.add_argument('--processes', type=int, default=None, help='default is the cpu count')
+    parser.add_argument('--output', default=None, help='csv file, default is stdout')
+    parser.add_argument('--cache', default=None, help='sqlite file of the shot outcome cache')
+    parser.add_argument('--cache-size', type=int, default=shotcache.DISK_SIZE,
+                        help='max number of the outcomes in the cache file')
+    args = parser.parse_args()
+
+    distance_range = (args.distance[0], args.distance[1], int(args.distance[2]))
+    angle_range = (args.angle[0], args.angle[1], int(args.angle[2]))
+    grid = make_grid(distance_range, angle_range)
+    cache = None
+    if args.cache:
+        cache = shotcache.ShotCache(args.cache, disk_size=args.cache_size)
+    outcomes = sweep(args.level, grid, args.bird_index, args.tap_time, args.processes, cache)
+    if cache:
+        cache.close()
+        sys.stderr.write('cache: %s\n' % cache.get_stats())
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            write_table(outcomes, f)
+    else:
+        write_table(outcomes, sys.stdout)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+'''Structured event stream of the game: shots, damage, kills, spawns, abilities
+   and explosions. An event is a tuple stored into a preallocated ring buffer, a
+   writer thread takes the new events from the buffer, writes them as json lines
+   to the log file and passes them to the subscribers.
+   Recording is disabled when RECORDER is None, the call sites check it first:
+       if telemetry.RECORDER:
+           telemetry.RECORDER.record(telemetry.DAMAGE, time, ...)'''
+__author__ = 'marble_xu'
+
+import json
+import threading
+from . import constants as c
+
+SHOT = 'shot'
+DAMAGE = 'damage'
+KILL = 'kill'
+SPAWN = 'spawn'
+ABILITY = 'ability'
+EXPLOSION = 'explosion'
+
+# the names of the values of every event after the event type and the game time
+EVENT_FIELDS = {
+    SHOT:('name', 'distance', 'angle'),
+    DAMAGE:('name', 'damage', 'impulse', 'life'),
+    KILL:('name', 'x', 'y'),
+    SPAWN:('name', 'x', 'y', 'vx', 'vy'),
+    ABILITY:('name', 'vx', 'vy'),
+    EXPLOSION:('x', 'y', 'radius'),
+}
+
+RECORDER = None
+
+class Recorder():
+    def __init__(self, path=None, size=c.TELEMETRY_BUFFER_SIZE, interval=c.TELEMETRY_FLUSH_INTERVAL):
+        '''path is the json lines log file, there is no log file if it is None.
+           size is the number of events in the ring buffer, the oldest events not taken
+           by the writer are overwritten when it is full, they are counted in dropped.
+           interval is the seconds between two flushes of the writer thread'''
+        self.size = size
+        self.buffer = [None] * size
+        self.write_count = 0
+        self.read_count = 0
+        self.dropped = 0
+        self.interval = interval
+        self.subscribers = []
+        self.file = open(path, 'w') if path else None
+        # lock guards the buffer and its counts, record() of the game thread only
+        # waits for the events to be taken, not for them to be written.
+        # write_lock keeps the flushes of the writer thread and close() in order
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def record(self, *event):
+        '''event is (event type, game time, values of EVENT_FIELDS[event type])'''
+        with self.lock:
+            self.buffer[self.write_count % self.size] = event
+            self.write_count += 1
+
+    def subscribe(self, callback):
+        '''callback is called on the writer thread with the list of the new events'''
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def take_events(self):
+        '''must be called with lock held'''
+        write_count = self.write_count
+        if write_count - self.read_count > self.size:
+            self.dropped += write_count - self.read_count - self.size
+            self.read_count = write_count - self.size
+        events = [self.buffer[i % self.size] for i in range(self.read_count, write_count)]
+        self.read_count = write_count
+        return events
+
+    def flush(self):
+        with self.write_lock:
+            with self.lock:
+                events = self.take_events()
+            if not events:
+                return
+            if self.file:
+                self.file.writelines(json.dumps(to_dict(event)) + '\n' for event in events)
+                self.file.flush()
+            for callback in self.subscribers:
+                callback(events)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def to_dict(event):
+    '''return the event as a dict of the field names and values'''
+    result = {'event':event[0], 'time':event[1]}
+    result.update(zip(EVENT_FIELDS[event[0]], event[2:]))
+    return result
+
+def start(path=None, size=c.TELEMETRY_BUFFER_SIZE):
+    '''start recording the events of the game, return the recorder'''
+    global RECORDER
+    stop()
+    RECORDER = Recorder(path, size)
+    return RECORDER
+
+def stop():
+    '''stop recording, the events left in the buffer are flushed'''
+    global RECORDER
+    if RECORDER:
+        recorder, RECORDER = RECORDER, None
+        recorder.close()
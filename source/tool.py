@@ -2,8 +2,11 @@ __author__ = 'marble_xu'
 
 import os
 import json
+import time
 from abc import abstractmethod
+from collections import OrderedDict
 import pygame as pg
+from . import profiler
 from . import constants as c
 
 class State():
@@ -13,6 +16,8 @@ class State():
         self.done = False
         self.next = None
         self.persist = {}
+        # the regions of the screen changed by the last update, None means the whole screen
+        self.dirty_rects = None
     
     @abstractmethod
     def startup(self, current_time, persist):
@@ -26,12 +31,18 @@ class State():
     def update(sefl, surface, keys, current_time):
         '''abstract method'''
 
+    @abstractmethod
+    def render(self, surface, alpha):
+        '''abstract method, draw the state between the last two updates'''
+
 class Control():
-    def __init__(self):
+    def __init__(self, clock=None):
         self.screen = pg.display.get_surface()
         self.done = False
         self.clock = pg.time.Clock()
-        self.fps = 60
+        # the game time clock, is different from self.clock which limits the frame rate
+        self.game_clock = clock if clock else WallClock()
+        self.fps = c.RENDER_FPS if c.FIXED_RATE_PHYSICS else 60
         self.keys = pg.key.get_pressed()
         self.mouse_pos = None
         self.mouse_pressed = False
@@ -49,11 +60,13 @@ class Control():
         self.state = self.state_dict[self.state_name]
         self.state.startup(self.current_time, self.game_info)
 
-    def update(self):
-        self.current_time = pg.time.get_ticks()
+    def update(self, draw=True):
+        '''if draw is False, the state is drawn by render() instead of update()'''
+        self.current_time = self.game_clock.get_ticks()
         if self.state.done:
             self.flip_state()
-        self.state.update(self.screen, self.current_time, self.mouse_pos, self.mouse_pressed)
+        self.state.update(self.screen if draw else None, self.current_time,
+                          self.mouse_pos, self.mouse_pressed)
         self.mouse_pos = None
 
     def flip_state(self):
@@ -77,15 +90,112 @@ class Control():
                 self.mouse_pressed = False
 
     def main(self):
+        if c.FIXED_RATE_PHYSICS:
+            self.main_fixed_rate()
+            return
+
         while not self.done:
+            prof = profiler.PROFILER
+            start = prof.start() if prof else 0
             self.event_loop()
+            if prof:
+                start = prof.add(profiler.EVENT_LOOP, start)
             self.update()
-            pg.display.update()
+            if prof:
+                start = prof.add(profiler.UPDATE, start)
+                if c.DEBUG:
+                    prof.draw(self.screen)
+            if self.state.dirty_rects is None:
+                pg.display.update()
+            else:
+                pg.display.update(self.state.dirty_rects)
+            if prof:
+                prof.add(profiler.DISPLAY, start)
+            self.clock.tick(self.fps)
+            if c.DEBUG:
+                pg.display.set_caption("pos: " + str(pg.mouse.get_pos()))
+        print('game over')
+
+    def main_fixed_rate(self):
+        '''The state is updated c.PHYSICS_RATE times per second of real time, no matter
+           how often the frames are drawn. The real time of every loop is added to lag,
+           an update is run for every update time in lag, and the frame is drawn
+           with the part of an update left in lag, which is between the last two
+           updates. At most c.MAX_FRAME_UPDATES updates run for a frame, on a machine too
+           slow for them the game slows down instead of never drawing a frame'''
+        update_time = 1.0 / c.PHYSICS_RATE
+        lag = 0.0
+        last_time = time.perf_counter()
+        while not self.done:
+            prof = profiler.PROFILER
+            start = prof.start() if prof else 0
+            self.event_loop()
+            if prof:
+                start = prof.add(profiler.EVENT_LOOP, start)
+
+            now = time.perf_counter()
+            lag = min(lag + now - last_time, update_time * c.MAX_FRAME_UPDATES)
+            last_time = now
+            while lag >= update_time:
+                self.update(False)
+                lag -= update_time
+            if prof:
+                start = prof.add(profiler.UPDATE, start)
+
+            self.state.render(self.screen, lag / update_time)
+            if prof:
+                start = prof.add(profiler.RENDER, start)
+                if c.DEBUG:
+                    prof.draw(self.screen)
+            if self.state.dirty_rects is None:
+                pg.display.update()
+            else:
+                pg.display.update(self.state.dirty_rects)
+            if prof:
+                prof.add(profiler.DISPLAY, start)
             self.clock.tick(self.fps)
             if c.DEBUG:
                 pg.display.set_caption("pos: " + str(pg.mouse.get_pos()))
         print('game over')
 
+class WallClock():
+    '''game time is the real time since pygame was initialized'''
+    def step(self, dt):
+        pass
+
+    def get_ticks(self):
+        return pg.time.get_ticks()
+
+    def snapshot(self):
+        return None
+
+    def restore(self, snapshot):
+        pass
+
+class SimClock():
+    '''Game time driven by the physics steps instead of the wall time, so the timers
+       give the same result on every run, at any frame rate and without display.
+       Every physics step of dt seconds advances the game time by dt * ms_per_second
+       milliseconds, the default makes a frame of game time as long as a real frame
+       at 60 fps.'''
+    def __init__(self, ms_per_second=c.SIM_MS_PER_SECOND):
+        self.ms_per_second = ms_per_second
+        self.step_num = 0
+        self.sim_time = 0.0
+
+    def step(self, dt):
+        self.step_num += 1
+        self.sim_time += dt
+
+    def get_ticks(self):
+        return self.sim_time * self.ms_per_second
+
+    def snapshot(self):
+        return (self.step_num, self.sim_time)
+
+    def restore(self, snapshot):
+        self.step_num, self.sim_time = snapshot
+
 def distance(xo, yo, x, y):
     """distance between points"""
     dx = x - xo
@@ -94,6 +204,21 @@ def distance(xo, yo, x, y):
     return d
 
 def get_image(sheet, x, y, width, height, colorkey, scale):
+    '''return the frame of the sheet, every frame is made once and shared by all the
+       sprites, so the returned image must not be changed'''
+    key = (sheet, x, y, width, height, colorkey, scale)
+    image = FRAME_CACHE.get(key)
+    if image is None:
+        image = make_image(sheet, x, y, width, height, colorkey, scale)
+        if not HEADLESS and pg.display.get_surface():
+            # the same pixel format as the display is blitted without conversion
+            image = image.convert()
+        # run length encoding of the colorkey pixels makes the blit faster
+        image.set_colorkey(colorkey, pg.RLEACCEL)
+        FRAME_CACHE[key] = image
+    return image
+
+def make_image(sheet, x, y, width, height, colorkey, scale):
         image = pg.Surface([width, height])
         rect = image.get_rect()
 
@@ -104,22 +229,89 @@ def get_image(sheet, x, y, width, height, colorkey, scale):
                                     int(rect.height*scale)))
         return image
 
-def load_all_gfx(directory, colorkey=(255,0,255), accept=('.png', '.jpg', '.bmp', '.gif')):
+class RotateCache():
+    '''Cache of the rotated images keyed by (image, quantized angle).
+       The angle is rounded to a multiple of angle_step degrees, so an object at rest
+       or slowly rotating reuses the same rotated image. When the cache is full,
+       the least recently used image is removed.'''
+    def __init__(self, max_size=c.ROTATE_CACHE_SIZE, angle_step=c.ROTATE_ANGLE_STEP):
+        self.max_size = max_size
+        self.angle_step = angle_step
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def rotate(self, image, angle):
+        angle_num = round(360 / self.angle_step)
+        key = (image, round(angle / self.angle_step) % angle_num)
+        rotated = self.cache.get(key)
+        if rotated is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return rotated
+
+        self.misses += 1
+        rotated = pg.transform.rotate(image, key[1] * self.angle_step)
+        self.cache[key] = rotated
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return rotated
+
+    def set_angle_step(self, angle_step):
+        self.angle_step = angle_step
+        self.clear()
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+def rotate_image(image, angle):
+    '''rotate the image counter-clockwise by angle degrees using the global rotate cache'''
+    return ROTATE_CACHE.rotate(image, angle)
+
+def load_all_gfx(directory, colorkey=(255,0,255), accept=('.png', '.jpg', '.bmp', '.gif'), convert=True):
+    '''convert the images to the display format, it needs a display mode,
+       so it is disabled in headless mode'''
     graphics = {}
     for pic in os.listdir(directory):
         name, ext = os.path.splitext(pic)
         if ext.lower() in accept:
             img = pg.image.load(os.path.join(directory, pic))
             if img.get_alpha():
-                img = img.convert_alpha()
+                if convert:
+                    img = img.convert_alpha()
             else:
-                img = img.convert()
+                if convert:
+                    img = img.convert()
                 img.set_colorkey(colorkey)
             graphics[name] = img
     return graphics
 
-pg.init()
-pg.display.set_caption(c.ORIGINAL_CAPTION)
-SCREEN = pg.display.set_mode(c.SCREEN_SIZE)
+def init(headless=False):
+    '''init pygame and load all the graphics, must be called before creating any state.
+       In headless mode no window is created and pygame display is not initialized,
+       the images are only used to get the size of the sprites'''
+    global SCREEN, HEADLESS
+    if GFX:
+        return
+    HEADLESS = headless
+    if headless:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    else:
+        pg.init()
+        pg.display.set_caption(c.ORIGINAL_CAPTION)
+        SCREEN = pg.display.set_mode(c.SCREEN_SIZE)
+    GFX.update(load_all_gfx(os.path.join("resources","graphics"), convert=not headless))
 
-GFX = load_all_gfx(os.path.join("resources","graphics"))
\ No newline at end of file
+HEADLESS = False
+SCREEN = None
+ROTATE_CACHE = RotateCache()
+FRAME_CACHE = {} # (sheet, x, y, width, height, colorkey, scale): image
+GFX = {}
\ No newline at end of file